@@ -86,12 +86,6 @@ class Document(models.Model):
             ('view_document', 'View document'),
         )
 
-def create_document_permissions(sender, instance, created, **kwargs):
-    group = Group.objects.get(name=instance.project.name)
-    assign('view_document', group, instance)
-        
-post_save.connect(create_document_permissions, sender=Document)
-
 def ref_doc_version(instance, filename):
     fname, dot, extension = filename.rpartition('.')
     slug = defaultfilters.slugify(instance.document.name)
@@ -202,7 +196,6 @@ class ProjectActor(models.Model):
 def create_projectactor_permissions_and_add_to_group(sender, instance, created, **kwargs):
     group = Group.objects.get(name=instance.project.name)
     instance.user.groups.add(group)
-    assign('view_projectactor', group, instance)
     assign('edit_projectactor', instance.user, instance)
         
 post_save.connect(create_projectactor_permissions_and_add_to_group, sender=ProjectActor)
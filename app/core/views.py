@@ -4,7 +4,7 @@ from django.utils.decorators import method_decorator
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from app.frontend.views import PermissionRequiredMixin
 from app.core.models import Project, ProjectActor, Document, Version
-from app.steering.models import Iteration
+from app.steering.models import Iteration, states
 
 class ProjectDetailView(PermissionRequiredMixin, DetailView):
     permission_required = 'core.view_project'
@@ -13,8 +13,7 @@ class ProjectDetailView(PermissionRequiredMixin, DetailView):
     template_name = "core/project_detail.html"
     
     def get_object(self, **kwargs):
-        object = Project.objects.get(slug=self.kwargs['project_slug'])
-        return object
+        return self.request.project_context.project
 
     def get_context_data(self, **kwargs):
         context = super(ProjectDetailView, self).get_context_data(**kwargs)
@@ -22,7 +21,7 @@ class ProjectDetailView(PermissionRequiredMixin, DetailView):
         for iteration in self.object.iterations.all():
             elements_list.append(iteration)
         context.update({
-            'iterations': self.object.iterations.all().order_by('rank'),
+            'iterations': states.attach(list(self.object.iterations.all().order_by('rank'))),
             'actors': self.object.actors.all(),
             'documents': self.object.documents.all(),
             'elements_list': elements_list
@@ -36,13 +35,14 @@ class ProjectActorDetailView(PermissionRequiredMixin, DetailView):
     template_name = "core/projectactor_detail.html"
 
     def get_object(self, **kwargs):
-        object = ProjectActor.objects.get(id=self.kwargs['projectactor_id'])
-        return object
+        if getattr(self, 'object', None) is None:
+            self.object = ProjectActor.objects.get(id=self.kwargs['projectactor_id'])
+        return self.object
 
     def get_context_data(self, **kwargs):
         context = super(ProjectActorDetailView, self).get_context_data(**kwargs)
         context.update({
-            'project': Project.objects.get(slug=self.kwargs['project_slug'])
+            'project': self.request.project_context.project
         })
         return context
 
@@ -53,12 +53,13 @@ class DocumentDetailView(PermissionRequiredMixin, DetailView):
     template_name = "core/document_detail.html"
 
     def get_object(self, **kwargs):
-        object = ProjectActor.objects.get(id=self.kwargs['document_id'])
-        return object
+        if getattr(self, 'object', None) is None:
+            self.object = ProjectActor.objects.get(id=self.kwargs['document_id'])
+        return self.object
 
     def get_context_data(self, **kwargs):
         context = super(ProjectActorDetailView, self).get_context_data(**kwargs)
         context.update({
-            'project': Project.objects.get(slug=self.kwargs['project_slug'])
+            'project': self.request.project_context.project
         })
         return context
\ No newline at end of file
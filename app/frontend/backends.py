@@ -1,4 +1,45 @@
 from thirdparty.guardian.backends import ObjectPermissionBackend
+from app.core.models import Project, Document, ProjectActor
+from app.steering.models import Iteration, Subject, Report
+
+# object permissions implied by 'core.view_project' on the object's project,
+# with the lookup of that project from the object
+INHERITED_PERMISSIONS = (
+    (Iteration, 'view_iteration', 'project'),
+    (Subject, 'view_subject', 'iteration__project'),
+    (Report, 'view_report', 'project'),
+    (Document, 'view_document', 'project'),
+    (ProjectActor, 'view_projectactor', 'project'),
+)
+
+def get_inherited_project(perm, obj):
+    """Returns the Project whose 'view_project' permission grants ``perm`` on
+    ``obj``, or None if ``perm`` is not inherited."""
+    codename = perm.split('.')[-1]
+    for model, inherited_codename, lookup in INHERITED_PERMISSIONS:
+        if isinstance(obj, model) and codename == inherited_codename:
+            # checks only need the project's primary key: relations already
+            # loaded are followed, the rest of the lookup is read with one
+            # values_list query and neither the project nor any row between
+            # is fetched
+            path = lookup.split('__')
+            while len(path) > 1 and hasattr(obj, obj._meta.get_field(path[0]).get_cache_name()):
+                obj = getattr(obj, path[0])
+                path = path[1:]
+            if len(path) == 1:
+                return Project(pk=getattr(obj, path[0] + '_id'))
+            project_ids = obj.__class__._default_manager.filter(pk=obj.pk).values_list('__'.join(path), flat=True)[:1]
+            if not project_ids:
+                return None
+            return Project(pk=project_ids[0])
+    return None
 
 class AMMSPermissionBackend(ObjectPermissionBackend):
-    supports_anonymous_user = False
\ No newline at end of file
+    supports_anonymous_user = False
+
+    def has_perm(self, user_obj, perm, obj=None):
+        project = get_inherited_project(perm, obj)
+        if project is not None and super(AMMSPermissionBackend, self).has_perm(user_obj, 'core.view_project', project):
+            return True
+        # permissions given on the object itself still apply
+        return super(AMMSPermissionBackend, self).has_perm(user_obj, perm, obj)
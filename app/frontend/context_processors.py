@@ -0,0 +1,4 @@
+def project_context(request):
+    """Makes the request's ProjectContext (see ProjectContextMiddleware)
+    available to templates as ``project_context``."""
+    return {'project_context': getattr(request, 'project_context', None)}
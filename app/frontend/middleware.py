@@ -0,0 +1,62 @@
+from django.core.exceptions import ImproperlyConfigured
+from app.core.models import Project, ProjectActor
+from thirdparty.guardian.core import get_checker
+from thirdparty.guardian.exceptions import WrongAppError
+
+class ProjectContext(object):
+    """The project a request is about with the requesting user's actor and
+    project permissions, each loaded on first use and then shared by the
+    views, forms and templates of the request."""
+
+    def __init__(self, user, project_slug):
+        self.user = user
+        self.project_slug = project_slug
+
+    @property
+    def project(self):
+        if not hasattr(self, '_project'):
+            self._project = Project.objects.get(slug=self.project_slug)
+        return self._project
+
+    @property
+    def actor(self):
+        """The user's ProjectActor on the project, None if they are not one."""
+        if not hasattr(self, '_actor'):
+            self._actor = None
+            if self.user.is_authenticated():
+                actors = ProjectActor.objects.filter(user=self.user, project=self.project)[:1]
+                if actors:
+                    self._actor = actors[0]
+                    # avoids fetching the project again through the actor
+                    self._actor.project = self.project
+        return self._actor
+
+    @property
+    def perms(self):
+        """Codenames of the user's permissions on the project."""
+        if not hasattr(self, '_perms'):
+            self._perms = set()
+            # like the object permission backend, which skips anonymous users
+            if self.user.is_authenticated():
+                self._perms = set(get_checker(self.user).get_perms(self.project))
+        return self._perms
+
+    def has_perm(self, perm):
+        """Same as ``user.has_perm(perm, project)``, answered from ``perms``."""
+        if '.' in perm:
+            app_label, perm = perm.split('.')
+            if app_label != self.project._meta.app_label:
+                raise WrongAppError("Passed perm has app label of '%s' and project has '%s'"
+                    % (app_label, self.project._meta.app_label))
+        return perm in self.perms
+
+class ProjectContextMiddleware(object):
+    """Sets ``request.project_context`` for views taking a ``project_slug``
+    argument. Must be placed after AuthenticationMiddleware."""
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not hasattr(request, 'user'):
+            raise ImproperlyConfigured("'ProjectContextMiddleware' requires 'AuthenticationMiddleware' to be installed before it")
+        if 'project_slug' in view_kwargs:
+            request.project_context = ProjectContext(request.user, view_kwargs['project_slug'])
+        return None
@@ -0,0 +1,135 @@
+# encoding: utf-8
+import datetime
+from south.db import db
+from south.v2 import DataMigration
+from django.db import models
+
+# object permissions implied by 'core.view_project' on the object's project,
+# frozen copy of app.frontend.backends.INHERITED_PERMISSIONS
+INHERITED_PERMISSIONS = (
+    ('steering.Iteration', 'view_iteration', 'project'),
+    ('steering.Subject', 'view_subject', 'iteration__project'),
+    ('steering.Report', 'view_report', 'project'),
+    ('core.Document', 'view_document', 'project'),
+    ('core.ProjectActor', 'view_projectactor', 'project'),
+)
+
+# object_pk values compared per query, keeps it under SQLite variables limit
+CHUNK_SIZE = 500
+
+class Migration(DataMigration):
+
+    depends_on = (
+        ('guardian', '0008_auto__add_index_objectpermission_object_pk'),
+    )
+
+    def get_inherited_objects(self, orm):
+        """
+        Yields the project group, the content type, the permission and the
+        primary keys of the objects of each project for every inherited
+        permission. Projects without a group are skipped.
+        """
+        groups = dict(orm['auth.Group'].objects.values_list('name', 'id'))
+        for model_name, codename, lookup in INHERITED_PERMISSIONS:
+            Model = orm[model_name]
+            app_label, model = model_name.lower().split('.')
+            ctype = orm['contenttypes.ContentType'].objects.get(app_label=app_label, model=model)
+            try:
+                permission = orm['auth.Permission'].objects.get(content_type=ctype, codename=codename)
+            except orm['auth.Permission'].DoesNotExist:
+                continue
+            for project_id, name in orm['core.Project'].objects.values_list('id', 'name'):
+                if name not in groups:
+                    continue
+                pks = list(Model.objects.filter(**{lookup: project_id}).values_list('pk', flat=True))
+                yield groups[name], ctype, permission, pks
+
+    def forwards(self, orm):
+        """
+        Deletes the per-object view permissions of project groups, which
+        ``AMMSPermissionBackend`` now inherits from ``core.view_project``.
+        """
+        for group_id, ctype, permission, pks in self.get_inherited_objects(orm):
+            pks = [unicode(pk) for pk in pks]
+            for i in xrange(0, len(pks), CHUNK_SIZE):
+                orm['guardian.GroupObjectPermission'].objects.filter(group=group_id, content_type=ctype,
+                    permission=permission, object_pk__in=pks[i:i + CHUNK_SIZE]).delete()
+
+    def backwards(self, orm):
+        """
+        Gives project groups the view permission of each object of their
+        project again.
+        """
+        GroupObjectPermission = orm['guardian.GroupObjectPermission']
+        for group_id, ctype, permission, pks in self.get_inherited_objects(orm):
+            existing = set(GroupObjectPermission.objects.filter(group=group_id, content_type=ctype,
+                permission=permission).values_list('object_pk', flat=True))
+            for pk in pks:
+                if unicode(pk) not in existing:
+                    GroupObjectPermission.objects.create(group_id=group_id, content_type=ctype,
+                        permission=permission, object_pk=unicode(pk), object_id=pk)
+
+    # only the fields read above are frozen
+    models = {
+        'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        'auth.permission': {
+            'Meta': {'ordering': "('content_type__app_label', 'content_type__model', 'codename')", 'unique_together': "(('content_type', 'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'core.document': {
+            'Meta': {'object_name': 'Document'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'project': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "u'documents'", 'to': "orm['core.Project']"})
+        },
+        'core.project': {
+            'Meta': {'object_name': 'Project'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '255'})
+        },
+        'core.projectactor': {
+            'Meta': {'object_name': 'ProjectActor'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'project': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "u'actors'", 'to': "orm['core.Project']"})
+        },
+        'guardian.groupobjectpermission': {
+            'Meta': {'unique_together': "(['group', 'permission', 'content_type', 'object_pk'],)", 'object_name': 'GroupObjectPermission'},
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'group': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.Group']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'object_id': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'object_pk': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'permission': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.Permission']"})
+        },
+        'steering.iteration': {
+            'Meta': {'object_name': 'Iteration'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'project': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "u'iterations'", 'to': "orm['core.Project']"})
+        },
+        'steering.report': {
+            'Meta': {'object_name': 'Report'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'project': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "u'reports'", 'to': "orm['core.Project']"})
+        },
+        'steering.subject': {
+            'Meta': {'object_name': 'Subject'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'iteration': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "u'subjects'", 'to': "orm['steering.Iteration']"})
+        }
+    }
+
+    complete_apps = ['frontend']
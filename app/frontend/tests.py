@@ -5,7 +5,19 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.models import User, Group, AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.views.generic import View
+from app.core.models import Project, ProjectActor
+from app.frontend.middleware import ProjectContext
+from app.frontend.views import PermissionRequiredMixin
+from app.steering.models import State, Iteration, Subject, Report, states
+from thirdparty.guardian.shortcuts import assign
 
 
 class SimpleTest(TestCase):
@@ -14,3 +26,105 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class ProjectContextTest(TestCase):
+
+    def setUp(self):
+        self.project = Project.objects.create(name='Persona', description='Persona project')
+        self.member = User.objects.create(username='joe')
+        self.member.groups.add(Group.objects.get(name=self.project.name))
+        self.outsider = User.objects.create(username='jane')
+        self.admin = User.objects.create(username='admin', is_superuser=True)
+
+    def test_has_perm_matches_user_has_perm(self):
+        for user in (self.member, self.outsider, self.admin, AnonymousUser()):
+            context = ProjectContext(user, self.project.slug)
+            for perm in ('core.view_project', 'core.change_project'):
+                self.assertEqual(context.has_perm(perm), user.has_perm(perm, self.project), (user, perm))
+        self.assertTrue(ProjectContext(self.member, self.project.slug).has_perm('core.view_project'))
+        self.assertFalse(ProjectContext(self.outsider, self.project.slug).has_perm('core.view_project'))
+
+
+class ProjectTestCase(TestCase):
+    """A project with a member, an outsider, a subject and a report."""
+
+    def setUp(self):
+        states.clear()
+        for rank, (name, type) in enumerate(settings.STEERING_STATES):
+            State.objects.create(name=name, rank=rank, type=type, icon='states_icon/%d.png' % rank)
+        self.project = Project.objects.create(name='Persona', description='Persona project')
+        self.member = User.objects.create(username='joe')
+        self.member.groups.add(Group.objects.get(name=self.project.name))
+        self.outsider = User.objects.create(username='jane')
+        actor = ProjectActor.objects.create(project=self.project, user=self.member)
+        iteration = Iteration.objects.create(name='Iteration 1', rank=1, description='First iteration',
+            state=State.objects.get(name='On Going'), project=self.project, current=True)
+        self.subject = Subject.objects.create(name='Subject', content='Content', author=actor,
+            state=State.objects.get(name='Open'), iteration=iteration)
+        section = {'total': 0, 'replies': 0, 'subjects': []}
+        self.report = Report.objects.create(date=date.today(), project=self.project, current_iteration=iteration,
+            new_subjects=section, open_subjects=section, closed_solved_subjects=section, closed_unsolved_subjects=section)
+
+
+class AMMSPermissionBackendTest(ProjectTestCase):
+
+    def test_project_members_inherit_view_permissions(self):
+        self.assertTrue(self.member.has_perm('steering.view_subject', self.subject))
+        self.assertTrue(self.member.has_perm('steering.view_report', self.report))
+        # loaded without its relations, the project is looked up
+        self.assertTrue(self.member.has_perm('steering.view_subject', Subject.objects.get(pk=self.subject.pk)))
+        # only view permissions are inherited
+        self.assertFalse(self.member.has_perm('steering.change_subject', self.subject))
+
+    def test_outsiders_do_not(self):
+        self.assertFalse(self.outsider.has_perm('steering.view_subject', self.subject))
+        self.assertFalse(self.outsider.has_perm('steering.view_report', self.report))
+
+    def test_permissions_on_the_object_still_apply(self):
+        assign('view_subject', self.outsider, self.subject)
+        self.assertTrue(User.objects.get(pk=self.outsider.pk).has_perm('steering.view_subject', self.subject))
+        self.assertFalse(self.outsider.has_perm('steering.view_report', self.report))
+
+
+class SubjectView(PermissionRequiredMixin, View):
+    permission_required = 'steering.view_subject'
+
+    def get_object(self, **kwargs):
+        if getattr(self, 'object', None) is None:
+            self.fetched = getattr(self, 'fetched', 0) + 1
+            self.object = Subject.objects.get(id=self.kwargs['subject_id'])
+        return self.object
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse('%s %d' % (self.get_object().name, self.fetched))
+
+
+class PermissionRequiredMixinTest(ProjectTestCase):
+
+    def get(self, user, view=SubjectView):
+        request = RequestFactory().get('/subjects/%d/' % self.subject.id)
+        request.user = user
+        return view.as_view()(request, subject_id=self.subject.id)
+
+    def test_allowed(self):
+        response = self.get(self.member)
+        self.assertEqual(response.status_code, 200)
+        # the object checked is the one the view uses
+        self.assertEqual(response.content, 'Subject 1')
+
+    def test_redirect(self):
+        response = self.get(self.outsider)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '%s?next=/subjects/%d/' % (settings.LOGIN_URL, self.subject.id))
+
+    def test_forbidden(self):
+        class ForbiddenSubjectView(SubjectView):
+            raise_exception = True
+        self.assertEqual(self.get(self.outsider, ForbiddenSubjectView).status_code, 403)
+        self.assertEqual(self.get(self.member, ForbiddenSubjectView).status_code, 200)
+
+    def test_improperly_configured(self):
+        class MisconfiguredView(SubjectView):
+            permission_required = 'view_subject'
+        self.assertRaises(ImproperlyConfigured, self.get, self.member, MisconfiguredView)
@@ -1,8 +1,9 @@
 from django.conf.urls.defaults import patterns, include, url
-from app.frontend.views import HomeView
+from app.frontend.views import HomeView, SearchView
 
 urlpatterns = patterns('',
     url(r'^$', HomeView.as_view(), name="home"),
+    url(r'^search/$', SearchView.as_view(), name="search"),
     url(r'^projects/', include('app.core.urls')),
     url(r'^login/$', 'django.contrib.auth.views.login', {'template_name': 'login.html'}, name="login"),
     url(r'^logout/$', 'django.contrib.auth.views.logout', {'next_page': '/', 'redirect_field_name': 'redirect_to'}, name="logout"),
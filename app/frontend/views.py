@@ -1,10 +1,12 @@
-from django.views.generic import ListView
+from django.views.generic import ListView, TemplateView
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.utils.http import urlquote
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from app.core.models import Project
+from app.steering.search import search
 from thirdparty.guardian.shortcuts import get_objects_for_user
 
 class PermissionRequiredMixin(object):
@@ -15,19 +17,28 @@ class PermissionRequiredMixin(object):
     redirect_field_name = 'next'
 
     def dispatch(self, request, *args, **kwargs):
-        # call the parent dispatch first to pre-populate few things before we check for permissions
-        original_return_value = super(PermissionRequiredMixin, self).dispatch(request, *args, **kwargs)
-
         # verify class settings
         if self.permission_required == None or len(self.permission_required.split('.')) != 2:
             raise ImproperlyConfigured("'PermissionRequiredMixin' requires 'permission_required' attribute to be set to '<app_label>.<permission codename>' but is set to '%s' instead" % self.permission_required)
 
+        # check permission before the view does any work, get_object() needs these set already
+        self.request = request
+        self.args = args
+        self.kwargs = kwargs
+
         # verify permission on object instance if needed
         has_permission = False
-        if hasattr(self, 'object')  and self.object is not None:
-            has_permission = request.user.has_perm(self.permission_required, self.object)
-        elif hasattr(self, 'get_object') and callable(self.get_object):
-            has_permission = request.user.has_perm(self.permission_required, self.get_object())
+        if hasattr(self, 'get_object') and callable(self.get_object):
+            # kept in self.object, which the view's get_object returns
+            # instead of fetching the object again
+            self.object = obj = self.get_object()
+            project_context = getattr(request, 'project_context', None)
+            if project_context is not None and obj is project_context.project:
+                # the request's project permissions, loaded once for the
+                # views and templates of the request
+                has_permission = project_context.has_perm(self.permission_required)
+            else:
+                has_permission = request.user.has_perm(self.permission_required, obj)
         else:
             has_permission = request.user.has_perm(self.permission_required)
 
@@ -40,8 +51,8 @@ class PermissionRequiredMixin(object):
                 tup = self.login_url, self.redirect_field_name, path
                 return HttpResponseRedirect("%s?%s=%s" % tup)
 
-        # user passed permission check so just return the result of calling .dispatch()
-        return original_return_value
+        # user passed permission check so let the view build the response
+        return super(PermissionRequiredMixin, self).dispatch(request, *args, **kwargs)
 
 class HomeView(ListView):
     context_object_name = "project_list"
@@ -54,3 +65,20 @@ class HomeView(ListView):
     def get_queryset(self):
         return get_objects_for_user(self.request.user, 'core.view_project')
 
+
+class SearchView(TemplateView):
+    template_name = "search.html"
+
+    @method_decorator(login_required)
+    def dispatch(self, *args, **kwargs):
+        return super(SearchView, self).dispatch(*args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        query = self.request.GET.get('q', '')
+        context.update({
+            'query': query,
+            # ranked dicts rather than a queryset, see app.steering.search
+            'results': search(self.request.user, query)
+        })
+        return context
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from app.steering.models import Tag, State, Iteration, Subject, Reply, Report
+from app.steering.models import Tag, State, Iteration, Subject, Reply, Report, IterationMetrics
 from app.steering.forms import IterationForm, StateForm, SubjectAdminForm
 
 class IterationAdmin(admin.ModelAdmin):
@@ -24,9 +24,14 @@ class ReportAdmin(admin.ModelAdmin):
     list_display_links = ('__unicode__',)
     list_filter = ['project',]
 
+class IterationMetricsAdmin(admin.ModelAdmin):
+    list_display = ('iteration', 'date', 'open_subjects', 'closed_solved_subjects', 'closed_unsolved_subjects', 'total_replies')
+    list_filter = ['project',]
+
 admin.site.register(Tag)
 admin.site.register(Iteration, IterationAdmin)
 admin.site.register(Subject, SubjectAdmin)
 admin.site.register(Reply)
 admin.site.register(State, StateAdmin)
 admin.site.register(Report, ReportAdmin)
+admin.site.register(IterationMetrics, IterationMetricsAdmin)
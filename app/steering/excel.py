@@ -0,0 +1,159 @@
+from django.contrib.sites.models import Site
+from app.steering.reports import get_report_sections
+from thirdparty.xlwt import Workbook, XFStyle, Font, Alignment, Formula, Pattern
+
+COLUMN_HEADERS = {
+    'name': 'Name',
+    'url': 'URL',
+    'author': 'Author',
+    'posted_at': 'Posted At',
+    'state': 'State',
+    'total_replies': 'Total Replies',
+}
+
+CURRENT_ITERATION_COLUMNS = (
+    ('Name', 'name'),
+    ('URL', 'url'),
+    ('Provisional Start', 'provisional_start_date'),
+    ('Provisional End', 'provisional_end_date'),
+    ('Effective Start', 'effective_start_date'),
+    ('Effective End', 'effective_end_date'),
+    ('Total Subjects', 'total_subjects'),
+    ('Total Replies', 'total_replies'),
+)
+
+SUBJECT_SECTIONS = (
+    ('new_subjects', 'New subjects (last 2 days)', ('name', 'url', 'author', 'posted_at', 'state', 'total_replies')),
+    ('open_subjects', 'Open subjects', ('name', 'url', 'author', 'posted_at', 'total_replies')),
+    ('closed_solved_subjects', 'Closed [Solved] subjects', ('name', 'url', 'author', 'posted_at', 'total_replies')),
+    ('closed_unsolved_subjects', 'Closed [Unsolved] subjects', ('name', 'url', 'author', 'posted_at', 'total_replies')),
+)
+
+ITERATION_SECTIONS = (
+    ('completed_iterations', 'Completed iterations'),
+    ('upcoming_iterations', 'Upcoming iterations'),
+)
+
+_styles = None
+
+def alignment(horz):
+    align = Alignment()
+    align.horz = horz
+    align.vert = Alignment.VERT_CENTER
+    return align
+
+def font(height, colour_index=None, bold=False, underline=None):
+    f = Font()
+    f.name = 'Arial'
+    f.bold = bold
+    f.height = height
+    if colour_index is not None:
+        f.colour_index = colour_index
+    if underline is not None:
+        f.underline = underline
+    return f
+
+def style(font, alignment, pattern=None):
+    s = XFStyle()
+    s.font = font
+    s.alignment = alignment
+    if pattern is not None:
+        s.pattern = pattern
+    return s
+
+def compile_styles():
+    pattern = Pattern()
+    pattern.pattern = pattern.SOLID_PATTERN
+    pattern.pattern_fore_color = 0x09
+    pattern.pattern_back_color = 0x3A
+    align_center = alignment(Alignment.HORZ_CENTER)
+    align_left = alignment(Alignment.HORZ_LEFT)
+    align_right = alignment(Alignment.HORZ_RIGHT)
+    font_title = font(400, 0x3A, bold=True)
+    return {
+        'title': style(font_title, align_right),
+        'title_date': style(font_title, align_left),
+        'subtitle': style(font(300, 0x3A, bold=True), align_right),
+        'header': style(font(250, 0x09, bold=True), align_center, pattern),
+        'normal': style(font(200), align_center),
+        'normal_link': style(font(200, 0x3A, underline=Font.UNDERLINE_SINGLE), align_center),
+    }
+
+def get_styles():
+    """Returns the report styles, compiled once per process."""
+    global _styles
+    if _styles is None:
+        _styles = compile_styles()
+    return _styles
+
+class ReportRenderer(object):
+    """Renders a Report into an Excel workbook following the sections
+    described above."""
+
+    def __init__(self, report):
+        self.report = report
+        self.styles = get_styles()
+        self.domain = Site.objects.get_current().domain
+
+    def link(self, url):
+        return Formula('HYPERLINK("http://' + self.domain + str(url) + '","Link")')
+
+    def cell(self, key, value):
+        if key == 'url':
+            return self.link(value), self.styles['normal_link']
+        return value, self.styles['normal']
+
+    def write_headers(self, sheet, line, headers):
+        for column, header in enumerate(headers):
+            sheet.write(line, column, header, self.styles['header'])
+
+    def current_iteration_values(self):
+        iteration = self.report.current_iteration
+        return {
+            'name': iteration.name,
+            'url': iteration.get_absolute_url(),
+            'provisional_start_date': iteration.provisional_start_date.strftime("%d/%m/%y"),
+            'provisional_end_date': iteration.provisional_end_date.strftime("%d/%m/%y"),
+            'effective_start_date': iteration.effective_start_date.strftime("%d/%m/%y"),
+            'effective_end_date': iteration.effective_end_date.strftime("%d/%m/%y"),
+            'total_subjects': iteration.total_subjects,
+            'total_replies': iteration.total_replies,
+        }
+
+    def render(self):
+        report = self.report
+        styles = self.styles
+        wb = Workbook()
+        sheet = wb.add_sheet(report.project.name + ' - Report')
+        sheet.write(0, 1, report.project.name + ' - Daily Report:', styles['title'])
+        sheet.write(0, 2, report.date.strftime("%d/%m/%y"), styles['title_date'])
+        sheet.write(2, 0, 'Current iteration', styles['subtitle'])
+        self.write_headers(sheet, 4, [header for header, key in CURRENT_ITERATION_COLUMNS])
+        values = self.current_iteration_values()
+        for column, (header, key) in enumerate(CURRENT_ITERATION_COLUMNS):
+            value, cell_style = self.cell(key, values[key])
+            sheet.write(5, column, value, cell_style)
+        sections = get_report_sections(report)
+        line = 7
+        for attr, title, columns in SUBJECT_SECTIONS:
+            data = sections[attr]
+            sheet.write(line, 0, title, styles['subtitle'])
+            sheet.write(line, 1, 'Total subjects: ' + str(data['total']), styles['subtitle'])
+            sheet.write(line, 2, 'Total replies: ' + str(data['replies']), styles['subtitle'])
+            line += 2
+            self.write_headers(sheet, line, [COLUMN_HEADERS[key] for key in columns])
+            line += 1
+            for s in data['subjects']:
+                for column, key in enumerate(columns):
+                    value, cell_style = self.cell(key, s[key])
+                    sheet.write(line, column, value, cell_style)
+                line += 1
+            line += 1
+        for index, (attr, title) in enumerate(ITERATION_SECTIONS):
+            if index:
+                line += 2
+            sheet.write(line, 0, title, styles['header'])
+            for i in getattr(report, attr).all():
+                sheet.write(line, 1, i.name, styles['normal'])
+                line += 1
+        return wb
@@ -0,0 +1,2 @@
+# connects the post_syncdb handler creating the full-text search table
+from app.steering import search
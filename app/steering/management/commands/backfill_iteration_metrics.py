@@ -0,0 +1,26 @@
+import logging
+
+from django.core.management.base import NoArgsCommand
+
+from app.steering import models as steering
+from app.steering.reports import SECTIONS, load_section, record_iteration_metrics
+
+class Command(NoArgsCommand):
+    help = "Fill the iteration metrics table from the reports generated before it existed."
+
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        existing = set(steering.IterationMetrics.objects.values_list('iteration', 'date'))
+        created = 0
+        for report in steering.Report.objects.order_by('date', 'id').iterator():
+            if (report.current_iteration_id, report.date) in existing:
+                continue
+            sections = dict((key, load_section(getattr(report, key))) for key in SECTIONS)
+            # the iteration's replies count is today's, past reports only
+            # know the replies of the subjects they list
+            total_replies = sum([sections[key]['replies'] for key in SECTIONS if key != 'new_subjects'])
+            record_iteration_metrics(report, sections, total_replies)
+            existing.add((report.current_iteration_id, report.date))
+            created += 1
+        if int(options.get('verbosity', 1)) > 0:
+            logging.info("Created %d iteration metrics row(s)" % created)
@@ -0,0 +1,212 @@
+import logging
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from optparse import make_option
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test.client import Client
+from django.utils import simplejson as json
+
+from app.core.models import Project, ProjectActor, ProjectRole
+from app.steering import models as steering
+
+BENCHMARK_PASSWORD = 'benchmark'
+
+def peak_memory():
+    # kilobytes on Linux, bytes on Mac OS X
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure(func, *args, **kwargs):
+    reset_queries()
+    start = time.time()
+    result = func(*args, **kwargs)
+    elapsed = time.time() - start
+    return result, {'seconds': elapsed, 'queries': len(connection.queries), 'peak_memory': peak_memory()}
+
+def summarize(samples):
+    seconds = [sample['seconds'] for sample in samples]
+    return {
+        'runs': len(samples),
+        'min_seconds': min(seconds),
+        'mean_seconds': sum(seconds) / len(seconds),
+        'max_seconds': max(seconds),
+        'queries': max([sample['queries'] for sample in samples]),
+        'peak_memory': max([sample['peak_memory'] for sample in samples]),
+    }
+
+def create_states():
+    for rank, (name, type) in enumerate(settings.STEERING_STATES):
+        steering.create_state(name, rank, type, 'states_icon/benchmark.png', verbosity=0)
+
+@transaction.commit_on_success
+def create_project(index, iterations, subjects, replies, actors):
+    """Creates a project whose second iteration is the current one, holding
+    ``subjects`` subjects with up to ``replies`` replies each."""
+    finished = steering.states.get('Finished')
+    on_going = steering.states.get('On Going')
+    not_started = steering.states.get('Not Started Yet')
+    subject_states = steering.states.filter_by_type('subject')
+    project = Project.objects.create(name='Benchmark %d' % index, description='Synthetic benchmark project')
+    role, created = ProjectRole.objects.get_or_create(name='Benchmark', defaults={'description': 'Synthetic benchmark role'})
+    project_actors = []
+    for i in range(actors):
+        user = User.objects.create(username='benchmark_%d_%d' % (index, i), first_name='Actor', last_name='%d-%d' % (index, i))
+        actor = ProjectActor.objects.create(project=project, user=user)
+        actor.project_roles.add(role)
+        project_actors.append(actor)
+    start = date.today() - timedelta(days=30)
+    current = None
+    for i in range(iterations):
+        if i == 1 or iterations == 1:
+            state = on_going
+        elif i < 1:
+            state = finished
+        else:
+            state = not_started
+        iteration = steering.Iteration.objects.create(name='Benchmark %d iteration %d' % (index, i), rank=i,
+            description='Synthetic benchmark iteration', state=state, project=project, current=(state == on_going),
+            provisional_start_date=start + timedelta(days=15 * i), provisional_end_date=start + timedelta(days=15 * i + 14),
+            effective_start_date=start + timedelta(days=15 * i), effective_end_date=start + timedelta(days=15 * i + 14))
+        if state == on_going:
+            current = iteration
+    old = datetime.now() - timedelta(days=7)
+    for i in range(subjects):
+        subject = steering.Subject.objects.create(name='Subject %d' % i, content='Synthetic benchmark subject',
+            author=project_actors[i % actors], state=subject_states[i % len(subject_states)], iteration=current)
+        for j in range(i % (replies + 1)):
+            steering.Reply.objects.create(title='Reply %d' % j, content='Synthetic benchmark reply',
+                author=project_actors[(i + j) % actors], subject=subject)
+        # keep a quarter of the subjects out of the new subjects section
+        if i % 4:
+            steering.Subject.objects.filter(pk=subject.pk).update(created_at=old)
+    return project
+
+class Command(NoArgsCommand):
+    help = "Benchmark the steering reports on synthetic projects built in an isolated in-memory SQLite database."
+    option_list = NoArgsCommand.option_list + (
+        make_option('--projects', action='store', dest='projects', type='int', default=1,
+            help='Number of synthetic projects.'),
+        make_option('--iterations', action='store', dest='iterations', type='int', default=4,
+            help='Number of iterations per project.'),
+        make_option('--subjects', action='store', dest='subjects', type='int', default=200,
+            help='Number of subjects in the current iteration of each project.'),
+        make_option('--replies', action='store', dest='replies', type='int', default=5,
+            help='Maximum number of replies per subject.'),
+        make_option('--actors', action='store', dest='actors', type='int', default=10,
+            help='Number of actors per project.'),
+        make_option('--repeat', action='store', dest='repeat', type='int', default=3,
+            help='Number of timed runs of each step per project.'),
+        make_option('--output', action='store', dest='output', default=None,
+            help='File the JSON results are written to, standard output by default.'),
+    )
+
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        parameters = {}
+        for key in ('projects', 'iterations', 'subjects', 'replies', 'actors', 'repeat'):
+            parameters[key] = int(options.get(key))
+            if parameters[key] < 1:
+                raise CommandError("--%s must be at least 1" % key)
+        if connection.settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("The benchmark runs on an in-memory SQLite database, the default database must use the sqlite3 backend")
+        verbosity = int(options.get('verbosity', 1))
+        # everything changed below is put back once done, even on failure
+        old_settings_dict = dict(connection.settings_dict)
+        old_use_debug_cursor = connection.use_debug_cursor
+        file_field = steering.Report._meta.get_field('file')
+        old_storage = file_field.storage
+        media_root = tempfile.mkdtemp(prefix='amms-benchmark-')
+        test_db_created = False
+        try:
+            connection.settings_dict['TEST_NAME'] = ':memory:'
+            file_field.storage = FileSystemStorage(location=media_root)
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            test_db_created = True
+            connection.use_debug_cursor = True
+            results = self.run(parameters, verbosity)
+        finally:
+            connection.use_debug_cursor = old_use_debug_cursor
+            if test_db_created:
+                connection.creation.destroy_test_db(old_settings_dict['NAME'], verbosity=0)
+            else:
+                connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(old_settings_dict)
+            file_field.storage = old_storage
+            shutil.rmtree(media_root, ignore_errors=True)
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if options.get('output'):
+            f = open(options['output'], 'w')
+            try:
+                f.write(output)
+            finally:
+                f.close()
+            if verbosity > 0:
+                logging.info("Results written to %s" % options['output'])
+        else:
+            sys.stdout.write(output + '\n')
+
+    def run(self, parameters, verbosity):
+        start = time.time()
+        create_states()
+        User.objects.create(id=settings.ANONYMOUS_USER_ID, username='anonymous')
+        user = User(username='benchmark', is_staff=True, is_superuser=True)
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save()
+        projects = []
+        for index in range(parameters['projects']):
+            projects.append(create_project(index, parameters['iterations'], parameters['subjects'],
+                parameters['replies'], parameters['actors']))
+        setup = time.time() - start
+        if verbosity > 0:
+            logging.info("Created %d synthetic project(s) in %.2fs" % (len(projects), setup))
+        client = Client()
+        client.login(username=user.username, password=BENCHMARK_PASSWORD)
+        samples = {
+            'generate_report': [],
+            'generate_excel_file': [],
+            'report_detail_view': [],
+            'iteration_detail_view': [],
+        }
+        for project in projects:
+            for run in range(parameters['repeat']):
+                steering.Report.objects.filter(project=project, date=date.today()).delete()
+                report_id, sample = measure(steering.generate_report, project)
+                if report_id is None:
+                    raise CommandError("Report generation failed for %s" % project.name)
+                samples['generate_report'].append(sample)
+                report = steering.Report.objects.get(id=report_id)
+                sample = measure(report.generate_excel_file)[1]
+                samples['generate_excel_file'].append(sample)
+                # rendered pages are cached by their ETag, start from a cold cache
+                cache.clear()
+                response, sample = measure(client.get, report.get_absolute_url())
+                if response.status_code != 200:
+                    raise CommandError("%s answered %d" % (report.get_absolute_url(), response.status_code))
+                samples['report_detail_view'].append(sample)
+                response, sample = measure(client.get, report.current_iteration.get_absolute_url())
+                if response.status_code != 200:
+                    raise CommandError("%s answered %d" % (report.current_iteration.get_absolute_url(), response.status_code))
+                samples['iteration_detail_view'].append(sample)
+            if verbosity > 0:
+                logging.info("%s: %d run(s) done" % (project.name, parameters['repeat']))
+        return {
+            'date': datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'parameters': parameters,
+            'setup_seconds': setup,
+            'peak_memory_unit': sys.platform == 'darwin' and 'B' or 'kB',
+            'results': dict((key, summarize(value)) for key, value in samples.items()),
+        }
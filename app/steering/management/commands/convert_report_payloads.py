@@ -0,0 +1,30 @@
+import ast
+import logging
+
+from django.core.management.base import NoArgsCommand
+from django.core.cache import cache
+from django.utils import simplejson as json
+
+from app.steering import models as steering
+from app.steering.reports import SECTIONS, report_sections_key
+
+class Command(NoArgsCommand):
+    help = "Convert report sections saved with str() to JSON."
+
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        converted = 0
+        for row in steering.Report.objects.values_list('id', *SECTIONS).order_by('id').iterator():
+            updates = {}
+            for key, value in zip(SECTIONS, row[1:]):
+                try:
+                    json.loads(value)
+                except ValueError:
+                    updates[key] = ast.literal_eval(value)
+            if updates:
+                steering.Report.objects.filter(id=row[0]).update(**updates)
+                # update() sends no post_save to clear the cached sections
+                cache.delete(report_sections_key(row[0]))
+                converted += 1
+        if int(options.get('verbosity', 1)) > 0:
+            logging.info("Converted %d report(s) to JSON sections" % converted)
@@ -1,21 +1,70 @@
-
 import logging
+import time
+import traceback
+from multiprocessing import Pool
+from optparse import make_option
 
 from django.core.management.base import NoArgsCommand
+from django.db import connection
 
 from app.core.models import Project
 from app.steering import models as steering
 from thirdparty.notification import models as notification
 
+def close_connection():
+    # forked workers must not share the parent's database connection, closing
+    # it forces each process to open its own on first query
+    connection.close()
+
+def generate_project_report(args):
+    project_id, incremental = args
+    start = time.time()
+    name = project_id
+    try:
+        project = Project.objects.get(id=project_id)
+        name = project.name
+        report_id = steering.generate_report(project, incremental)
+        if report_id is None:
+            return (project_id, name, None, time.time() - start, "report generation failed")
+        to_users = []
+        for actor in project.actors.all():
+            to_users.append(actor.user)
+        notification.queue(to_users, "daily_report_generated", {'report': steering.Report.objects.get(id=report_id)})
+        return (project_id, name, report_id, time.time() - start, None)
+    except Exception:
+        return (project_id, name, None, time.time() - start, traceback.format_exc())
+
 class Command(NoArgsCommand):
     help = "Generate daily reports."
-    
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', action='store', dest='workers', type='int', default=1,
+            help='Number of processes generating reports for separate projects in parallel.'),
+        make_option('--incremental', action='store_true', dest='incremental', default=False,
+            help='Only re-query the subjects which changed since the previous report.'),
+    )
+
     def handle_noargs(self, **options):
         logging.basicConfig(level=logging.DEBUG, format="%(message)s")
         logging.info("-" * 72)
-        for project in Project.objects.filter(enable_reports_generation=1):
-            report_id = steering.generate_report(project)
-            to_users = []
-            for actor in project.actors.all():
-                to_users.append(actor.user)
-            notification.queue(to_users, "daily_report_generated", {'report': steering.Report.objects.get(id=report_id)})
+        workers = max(int(options.get('workers') or 1), 1)
+        incremental = bool(options.get('incremental'))
+        tasks = [(project_id, incremental) for project_id in Project.objects.filter(enable_reports_generation=1).values_list('id', flat=True)]
+        start = time.time()
+        if workers > 1 and len(tasks) > 1:
+            close_connection()
+            pool = Pool(processes=min(workers, len(tasks)), initializer=close_connection)
+            try:
+                results = pool.map(generate_project_report, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [generate_project_report(task) for task in tasks]
+        failures = 0
+        for project_id, name, report_id, elapsed, error in results:
+            if error is None:
+                logging.info("%s: report %s generated in %.2fs" % (name, report_id, elapsed))
+            else:
+                failures += 1
+                logging.error("%s: failed after %.2fs\n%s" % (name, elapsed, error))
+        logging.info("%d project(s), %d failure(s), %d worker(s), %.2fs total" % (len(results), failures, workers, time.time() - start))
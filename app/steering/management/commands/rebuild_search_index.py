@@ -0,0 +1,23 @@
+import logging
+
+from django.core.management.base import NoArgsCommand
+
+from app.steering.search import create_search_table, rebuild_search_index
+
+class Command(NoArgsCommand):
+    help = "Create the full-text search table if needed and index all subjects, replies and tags again."
+
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        verbose = int(options.get('verbosity', 1)) > 0
+        if not create_search_table():
+            if verbose:
+                logging.info("Full-text search is not available on this database, searches use LIKE queries")
+            return
+
+        def progress(model, count):
+            if verbose:
+                logging.info("Indexed %d %s(s)" % (count, model._meta.verbose_name))
+        total = rebuild_search_index(progress)
+        if verbose:
+            logging.info("Indexed %d object(s)" % total)
@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import NoArgsCommand
+from django.db.models import Count
+
+from app.steering import models as steering
+
+class Command(NoArgsCommand):
+    help = "Recompute the stored subjects and replies counters of subjects and iterations, creating the missing ones."
+
+    def handle_noargs(self, **options):
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        existing = dict(steering.SubjectCounters.objects.values_list('subject', 'replies_count'))
+        fixed_subjects = 0
+        for id, count in steering.Subject.objects.annotate(count=Count('replies')).values_list('id', 'count').iterator():
+            if id not in existing:
+                steering.SubjectCounters.objects.create(subject_id=id, replies_count=count)
+            elif existing[id] != count:
+                steering.SubjectCounters.objects.filter(subject=id).update(replies_count=count)
+            else:
+                continue
+            fixed_subjects += 1
+        subjects = dict(steering.Subject.objects.values_list('iteration').annotate(count=Count('id')).order_by())
+        replies = dict(steering.Reply.objects.values_list('subject__iteration').annotate(count=Count('id')).order_by())
+        existing = dict((row[0], row[1:]) for row in steering.IterationCounters.objects.values_list('iteration', 'subjects_count', 'replies_count'))
+        fixed_iterations = 0
+        for id in steering.Iteration.objects.values_list('id', flat=True).iterator():
+            counts = (subjects.get(id, 0), replies.get(id, 0))
+            if id not in existing:
+                steering.IterationCounters.objects.create(iteration_id=id, subjects_count=counts[0], replies_count=counts[1])
+            elif existing[id] != counts:
+                steering.IterationCounters.objects.filter(iteration=id).update(subjects_count=counts[0], replies_count=counts[1])
+            else:
+                continue
+            fixed_iterations += 1
+        if int(options.get('verbosity', 1)) > 0:
+            logging.info("Fixed counters of %d subject(s) and %d iteration(s)" % (fixed_subjects, fixed_iterations))
@@ -1,19 +1,19 @@
-import os
-import ast
-from datetime import date, timedelta
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+from datetime import date
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.template import defaultfilters
-from django.contrib.auth.models import User, Group
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
-from django.contrib.sites.models import Site
 from django.core.files import File
+from django.core.cache import cache
 from django.conf import settings
 from app.core.models import Project, ProjectActor
 from app.steering import fields
-from thirdparty.guardian.shortcuts import assign
-from thirdparty.xlwt import Workbook, XFStyle, Font, Alignment, Formula, Pattern
+
+REPORT_FILE_MAX_MEMORY_SIZE = getattr(settings, 'REPORT_FILE_MAX_MEMORY_SIZE', 5 * 2**20)
 
 class Tag(models.Model):
     name = models.SlugField(u'name', unique=True)
@@ -45,6 +45,127 @@ class State(models.Model):
         verbose_name = u'State'
         verbose_name_plural = u'States'
 
+STATES_VERSION_KEY = 'steering.states_version'
+STATES_VERSION_CACHE_TIMEOUT = getattr(settings, 'STATES_VERSION_CACHE_TIMEOUT', 24 * 3600)
+
+class StateRegistry(object):
+    """All the States, loaded once per process then looked up by id, name,
+    type or rank without queries. States are seeded by create_states and
+    hardly ever change: saving or deleting one drops the version of the
+    States kept in the cache, and every process reloads its registry when it
+    sees a version other than the one it loaded. A lookup which misses also
+    reloads it once."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self, **kwargs):
+        self._by_id = None
+
+    def invalidate(self, **kwargs):
+        cache.delete(STATES_VERSION_KEY)
+        self.clear()
+
+    def get_version(self):
+        version = cache.get(STATES_VERSION_KEY)
+        if version is None:
+            cache.add(STATES_VERSION_KEY, uuid4().hex, STATES_VERSION_CACHE_TIMEOUT)
+            # another process may have added its own first
+            version = cache.get(STATES_VERSION_KEY)
+        return version
+
+    def load(self, reload=False):
+        version = self.get_version()
+        if self._by_id is None or reload or version != self._version:
+            by_id, by_name, by_rank, by_type = {}, {}, {}, {}
+            for state in State.objects.order_by('rank'):
+                by_id[state.id] = state
+                by_name[state.name] = state
+                by_rank[state.rank] = state
+                by_type.setdefault(state.type, []).append(state)
+            self._by_name, self._by_rank, self._by_type = by_name, by_rank, by_type
+            self._by_id, self._version = by_id, version
+
+    def lookup(self, index, key):
+        self.load()
+        if key not in getattr(self, index):
+            self.load(reload=True)
+            if key not in getattr(self, index):
+                raise State.DoesNotExist("No State matches %s" % key)
+        return getattr(self, index)[key]
+
+    def get(self, name):
+        return self.lookup('_by_name', name)
+
+    def get_by_id(self, id):
+        return self.lookup('_by_id', id)
+
+    def get_by_rank(self, rank):
+        return self.lookup('_by_rank', rank)
+
+    def filter_by_type(self, type):
+        """States of ``type`` ('iteration' or 'subject') ordered by rank."""
+        self.load()
+        return list(self._by_type.get(type, []))
+
+    def attach(self, objects):
+        """Sets the State of each object (Iteration or Subject) so that
+        ``object.state`` does not query it."""
+        self.load()
+        for obj in objects:
+            state = self._by_id.get(obj.state_id)
+            if state is None:
+                state = self.get_by_id(obj.state_id)
+            setattr(obj, obj._meta.get_field('state').get_cache_name(), state)
+        return objects
+
+states = StateRegistry()
+
+post_save.connect(states.invalidate, sender=State)
+post_delete.connect(states.invalidate, sender=State)
+
+CURRENT_ITERATION_CACHE_TIMEOUT = getattr(settings, 'CURRENT_ITERATION_CACHE_TIMEOUT', 24 * 3600)
+
+def current_iteration_key(project_id):
+    return 'steering.current_iteration.%s' % project_id
+
+def get_current_iteration(project):
+    """Returns the current Iteration of ``project``, found by primary key
+    through the cached id, which Iteration.save invalidates. A missing or
+    outdated id falls back to querying the ``current`` flag."""
+    iteration_id = cache.get(current_iteration_key(project.id))
+    if iteration_id is not None:
+        try:
+            return Iteration.objects.get(pk=iteration_id, project=project, current=True)
+        except Iteration.DoesNotExist:
+            pass
+    iteration = Iteration.objects.get(project=project, current=True)
+    cache.set(current_iteration_key(project.id), iteration.pk, CURRENT_ITERATION_CACHE_TIMEOUT)
+    return iteration
+
+REPORT_PAGES_VERSION_CACHE_TIMEOUT = getattr(settings, 'REPORT_PAGES_VERSION_CACHE_TIMEOUT', 24 * 3600)
+
+def report_pages_version_key(project_id):
+    return 'steering.report_pages_version.%s' % project_id
+
+def get_report_pages_version(project_id):
+    """Version of what the report pages of a project show: its reports, the
+    project, its iterations and their counters. A new one is drawn whenever
+    invalidate_report_pages drops it, never reusing an earlier version."""
+    key = report_pages_version_key(project_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, REPORT_PAGES_VERSION_CACHE_TIMEOUT)
+        # another process may have added its own first
+        version = cache.get(key)
+    return version
+
+def invalidate_report_pages(project_ids):
+    cache.delete_many([report_pages_version_key(project_id) for project_id in set(project_ids)])
+
+def invalidate_iterations_report_pages(**filters):
+    invalidate_report_pages(Iteration.objects.filter(**filters).values_list('project', flat=True))
+
 class Iteration(models.Model):
     name = models.CharField(u'name', max_length=255)
     rank = models.PositiveIntegerField(u'rank')
@@ -59,12 +180,14 @@ class Iteration(models.Model):
     current = models.BooleanField(u'current iteration')
     
     def save(self, *args, **kwargs):
-        self.slug = str(self.project.id) + '-' + defaultfilters.slugify(self.name)
-        if self.current == 1:
-            for iteration in self.project.iterations.all():
-                iteration.current = 0
-                iteration.save()
-        return super(Iteration, self).save(*args, **kwargs)
+        self.slug = str(self.project_id) + '-' + defaultfilters.slugify(self.name)
+        result = super(Iteration, self).save(*args, **kwargs)
+        if self.current:
+            # a single UPDATE, without the signals of saving each iteration
+            Iteration.objects.filter(project=self.project_id, current=True).exclude(pk=self.pk).update(current=False)
+        # get_current_iteration looks the current iteration up again
+        cache.delete(current_iteration_key(self.project_id))
+        return result
 
     def has_provisional_timetable(self):
         if self.provisional_start_date is not None and self.provisional_end_date is not None:
@@ -90,15 +213,20 @@ class Iteration(models.Model):
                 else:
                     return 'provisional'
     
+    def get_counters(self):
+        """The IterationCounters of the iteration (see select_related('counters')),
+        zero counters if it has none yet."""
+        try:
+            return self.counters
+        except IterationCounters.DoesNotExist:
+            return IterationCounters(iteration_id=self.pk)
+
     def _get_total_subjects(self):
-        return self.subjects.all().count()
+        return self.get_counters().subjects_count
     total_subjects = property(_get_total_subjects)
     
     def _get_total_replies(self):
-        total_replies = 0
-        for subject in self.subjects.all():
-            total_replies += subject.total_replies
-        return total_replies
+        return self.get_counters().replies_count
     total_replies = property(_get_total_replies)
     
     def __unicode__(self):
@@ -117,11 +245,6 @@ class Iteration(models.Model):
             ('view_iteration', 'View iteration'),
         )
 
-def create_iteration_permissions(sender, instance, created, **kwargs):
-    group = Group.objects.get(name=instance.project.name)
-    assign('view_iteration', group, instance)
-                
-post_save.connect(create_iteration_permissions, sender=Iteration)
     
 class Subject(models.Model):
     name = models.CharField(u'name', max_length=255)
@@ -136,13 +259,32 @@ class Subject(models.Model):
     
     def save(self, *args, **kwargs):
         self.slug = str(self.iteration.id) + '-' + defaultfilters.slugify(self.name)
-        return super(Subject, self).save(*args, **kwargs)
+        previous_iteration_id = None
+        if not self._state.adding:
+            # iteration the subject was loaded with, see remember_loaded_parent
+            previous_iteration_id = getattr(self, '_loaded_iteration_id', None)
+        result = super(Subject, self).save(*args, **kwargs)
+        if previous_iteration_id is not None and previous_iteration_id != self.iteration_id:
+            replies_count = self.get_counters().replies_count
+            IterationCounters.objects.filter(iteration=previous_iteration_id).update(subjects_count=F('subjects_count') - 1, replies_count=F('replies_count') - replies_count)
+            IterationCounters.objects.filter(iteration=self.iteration_id).update(subjects_count=F('subjects_count') + 1, replies_count=F('replies_count') + replies_count)
+            invalidate_iterations_report_pages(pk__in=[previous_iteration_id, self.iteration_id])
+        self._loaded_iteration_id = self.iteration_id
+        return result
     
     def __unicode__(self):
         return u'%s' % (self.name)
     
+    def get_counters(self):
+        """The SubjectCounters of the subject (see select_related('counters')),
+        zero counters if it has none yet."""
+        try:
+            return self.counters
+        except SubjectCounters.DoesNotExist:
+            return SubjectCounters(subject_id=self.pk)
+
     def _get_total_replies(self):
-        return self.replies.all().count()
+        return self.get_counters().replies_count
     total_replies = property(_get_total_replies)
 
     @models.permalink
@@ -156,11 +298,54 @@ class Subject(models.Model):
             ('view_subject', 'View subject'),
         )
         
-def create_subject_permissions(sender, instance, created, **kwargs):
-    group = Group.objects.get(name=instance.iteration.project.name)
-    assign('view_subject', group, instance)
-                
-post_save.connect(create_subject_permissions, sender=Subject)
+class IterationCounters(models.Model):
+    """Subjects and replies counters of an Iteration. They live in their
+    own table so that saving an iteration never writes them back: they are
+    only changed by F() UPDATEs from the Subject and Reply signals."""
+    iteration = models.OneToOneField(Iteration, verbose_name=u'iteration', related_name=u'counters', primary_key=True)
+    subjects_count = models.PositiveIntegerField(u'subjects count', default=0)
+    replies_count = models.PositiveIntegerField(u'replies count', default=0)
+
+    class Meta:
+        verbose_name = u'Iteration counters'
+        verbose_name_plural = u'Iterations counters'
+
+class SubjectCounters(models.Model):
+    """Replies counter of a Subject, see IterationCounters."""
+    subject = models.OneToOneField(Subject, verbose_name=u'subject', related_name=u'counters', primary_key=True)
+    replies_count = models.PositiveIntegerField(u'replies count', default=0)
+
+    class Meta:
+        verbose_name = u'Subject counters'
+        verbose_name_plural = u'Subjects counters'
+
+def remember_loaded_parent(sender, instance, **kwargs):
+    # lets save() tell a subject or reply moved to another parent without a query
+    if sender is Subject:
+        instance._loaded_iteration_id = instance.iteration_id
+    else:
+        instance._loaded_subject_id = instance.subject_id
+
+def create_iteration_counters(sender, instance, created, **kwargs):
+    if created:
+        IterationCounters.objects.create(iteration=instance)
+
+post_save.connect(create_iteration_counters, sender=Iteration)
+
+def increment_subjects_count(sender, instance, created, **kwargs):
+    if created:
+        SubjectCounters.objects.create(subject=instance)
+        IterationCounters.objects.filter(iteration=instance.iteration_id).update(subjects_count=F('subjects_count') + 1)
+        invalidate_iterations_report_pages(pk=instance.iteration_id)
+
+post_save.connect(increment_subjects_count, sender=Subject)
+
+def decrement_subjects_count(sender, instance, **kwargs):
+    # replies deleted along with the subject decrement the iteration's replies count themselves
+    IterationCounters.objects.filter(iteration=instance.iteration_id).update(subjects_count=F('subjects_count') - 1)
+    invalidate_iterations_report_pages(pk=instance.iteration_id)
+
+pre_delete.connect(decrement_subjects_count, sender=Subject)
         
 class Reply(models.Model):
     title = models.CharField(u'name', max_length=255)
@@ -170,6 +355,18 @@ class Reply(models.Model):
     updated_at = models.DateTimeField(auto_now=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
 
+    def save(self, *args, **kwargs):
+        previous_subject_id = None
+        if not self._state.adding:
+            # subject the reply was loaded with, see remember_loaded_parent
+            previous_subject_id = getattr(self, '_loaded_subject_id', None)
+        result = super(Reply, self).save(*args, **kwargs)
+        if previous_subject_id is not None and previous_subject_id != self.subject_id:
+            update_replies_count(previous_subject_id, -1)
+            update_replies_count(self.subject_id, 1)
+        self._loaded_subject_id = self.subject_id
+        return result
+
     def __unicode__(self):
         return u'%s' % (self.title)
 
@@ -177,6 +374,37 @@ class Reply(models.Model):
         verbose_name = u'Reply'
         verbose_name_plural = u'Replies'
 
+post_init.connect(remember_loaded_parent, sender=Subject)
+post_init.connect(remember_loaded_parent, sender=Reply)
+
+def update_replies_count(subject_id, delta):
+    SubjectCounters.objects.filter(subject=subject_id).update(replies_count=F('replies_count') + delta)
+    IterationCounters.objects.filter(iteration__subjects=subject_id).update(replies_count=F('replies_count') + delta)
+    invalidate_iterations_report_pages(subjects=subject_id)
+
+def increment_replies_count(sender, instance, created, **kwargs):
+    if created:
+        update_replies_count(instance.subject_id, 1)
+
+post_save.connect(increment_replies_count, sender=Reply)
+
+def decrement_replies_count(sender, instance, **kwargs):
+    # pre_delete: the subject still exists to reach its iteration, even when
+    # the reply is deleted by a cascade
+    update_replies_count(instance.subject_id, -1)
+
+pre_delete.connect(decrement_replies_count, sender=Reply)
+
+def invalidate_project_report_pages(sender, instance, **kwargs):
+    if sender is Project:
+        invalidate_report_pages([instance.pk])
+    else:
+        invalidate_report_pages([instance.project_id])
+
+post_save.connect(invalidate_project_report_pages, sender=Project)
+post_save.connect(invalidate_project_report_pages, sender=Iteration)
+post_delete.connect(invalidate_project_report_pages, sender=Iteration)
+
 class Report(models.Model):
     date = models.DateField(u'date')
     project = models.ForeignKey(Project, verbose_name=u'project', related_name=u'reports')
@@ -197,179 +425,17 @@ class Report(models.Model):
         return ('report-detail', [str(self.project.slug), str(self.id)])
     
     def generate_excel_file(self):
-        wb = Workbook()
-        sheet_title = self.project.name + ' - Report'
-        sheet = wb.add_sheet(sheet_title)
-        # styles & fonts definitions
-        pattern = Pattern()
-        pattern.pattern = pattern.SOLID_PATTERN
-        pattern.pattern_fore_color = 0x09
-        pattern.pattern_back_color = 0x3A
-        align_center = Alignment()
-        align_center.horz = Alignment.HORZ_CENTER
-        align_center.vert = Alignment.VERT_CENTER
-        align_left = Alignment()
-        align_left.horz = Alignment.HORZ_LEFT
-        align_left.vert = Alignment.VERT_CENTER
-        align_right = Alignment()
-        align_right.horz = Alignment.HORZ_RIGHT
-        align_right.vert = Alignment.VERT_CENTER
-        title = XFStyle()
-        font_title = Font()
-        font_title.name = 'Arial'
-        font_title.bold = True
-        font_title.height = 400
-        font_title.colour_index = 0x3A
-        title.font = font_title
-        title.alignment = align_right
-        title_date = XFStyle()
-        title_date.font = font_title
-        title_date.alignment = align_left
-        subtitle = XFStyle()
-        font_subtitle = Font()
-        font_subtitle.name = 'Arial'
-        font_subtitle.bold = True
-        font_subtitle.height = 300
-        font_subtitle.colour_index = 0x3A
-        subtitle.font = font_subtitle
-        subtitle.alignment = align_right
-        header = XFStyle()
-        font_header = Font()
-        font_header.name = 'Arial'
-        font_header.bold = True
-        font_header.height = 250
-        font_header.colour_index = 0x09
-        header.font = font_header
-        header.alignment = align_center
-        header.pattern = pattern
-        normal = XFStyle()
-        font_normal = Font()
-        font_normal.name = 'Arial'
-        font_normal.height = 200
-        normal.font = font_normal
-        normal.alignment = align_center
-        normal_link = XFStyle()
-        font_normal_link = Font()
-        font_normal_link.name = 'Arial'
-        font_normal_link.height = 200
-        font_normal_link.colour_index = 0x3A
-        font_normal_link.underline = Font.UNDERLINE_SINGLE
-        normal_link.font = font_normal_link
-        normal_link.alignment = align_center         
-        # writing
-        n = "HYPERLINK"
-        sheet.write(0, 1, self.project.name + ' - Daily Report:', title)
-        sheet.write(0, 2, self.date.strftime("%d/%m/%y"), title_date)
-        sheet.write(2, 0, 'Current iteration', subtitle)
-        sheet.write(4, 0, 'Name', header)
-        sheet.write(4, 1, 'URL', header)
-        sheet.write(4, 2, 'Provisional Start', header)
-        sheet.write(4, 3, 'Provisional End', header)
-        sheet.write(4, 4, 'Effective Start', header)
-        sheet.write(4, 5, 'Effective End', header)
-        sheet.write(4, 6, 'Total Subjects', header)
-        sheet.write(4, 7, 'Total Replies', header)
-        sheet.write(5, 0, self.current_iteration.name, normal)
-        sheet.write(5, 1, Formula(n + '("http://' + Site.objects.get_current().domain + str(self.current_iteration.get_absolute_url()) + '","Link")'), normal_link)
-        sheet.write(5, 2, self.current_iteration.provisional_start_date.strftime("%d/%m/%y"), normal)
-        sheet.write(5, 3, self.current_iteration.provisional_end_date.strftime("%d/%m/%y"), normal)
-        sheet.write(5, 4, self.current_iteration.effective_start_date.strftime("%d/%m/%y"), normal)
-        sheet.write(5, 5, self.current_iteration.effective_end_date.strftime("%d/%m/%y"), normal)
-        sheet.write(5, 6, self.current_iteration.total_subjects, normal)
-        sheet.write(5, 7, self.current_iteration.total_replies, normal)
-        ns = ast.literal_eval(self.new_subjects)
-        sheet.write(7, 0, 'New subjects (last 2 days)', subtitle)
-        sheet.write(7, 1, 'Total subjects: ' + str(ns['total']), subtitle)
-        sheet.write(7, 2, 'Total replies: ' + str(ns['replies']), subtitle)
-        sheet.write(9, 0, 'Name', header)
-        sheet.write(9, 1, 'URL', header)
-        sheet.write(9, 2, 'Author', header)
-        sheet.write(9, 3, 'Posted At', header)
-        sheet.write(9, 4, 'State', header)
-        sheet.write(9, 5, 'Total Replies', header)
-        line = 10
-        for s in ns['subjects']:
-            sheet.write(line, 0, s['name'], normal)
-            sheet.write(line, 1, Formula(n + '("http://' + Site.objects.get_current().domain + str(s['url']) + '","Link")'), normal_link)
-            sheet.write(line, 2, s['author'], normal)
-            sheet.write(line, 3, s['posted_at'], normal)
-            sheet.write(line, 4, s['state'], normal)
-            sheet.write(line, 5, s['total_replies'], normal)
-            line += 1
-        line += 1
-        ops = ast.literal_eval(self.open_subjects)
-        sheet.write(line, 0, 'Open subjects', subtitle)
-        sheet.write(line, 1, 'Total subjects: ' + str(ops['total']), subtitle)
-        sheet.write(line, 2, 'Total replies: ' + str(ops['replies']), subtitle)
-        line += 2
-        sheet.write(line, 0, 'Name', header)
-        sheet.write(line, 1, 'URL', header)
-        sheet.write(line, 2, 'Author', header)
-        sheet.write(line, 3, 'Posted At', header)
-        sheet.write(line, 4, 'Total Replies', header)
-        line += 1
-        for s in ops['subjects']:
-            sheet.write(line, 0, s['name'], normal)
-            sheet.write(line, 1, Formula(n + '("http://' + Site.objects.get_current().domain + str(s['url']) + '","Link")'), normal_link)
-            sheet.write(line, 2, s['author'], normal)
-            sheet.write(line, 3, s['posted_at'], normal)
-            sheet.write(line, 4, s['total_replies'], normal)
-            line += 1
-        line += 1
-        css = ast.literal_eval(self.closed_solved_subjects)
-        sheet.write(line, 0, 'Closed [Solved] subjects', subtitle)
-        sheet.write(line, 1, 'Total subjects: ' + str(css['total']), subtitle)
-        sheet.write(line, 2, 'Total replies: ' + str(css['replies']), subtitle)
-        line += 2
-        sheet.write(line, 0, 'Name', header)
-        sheet.write(line, 1, 'URL', header)
-        sheet.write(line, 2, 'Author', header)
-        sheet.write(line, 3, 'Posted At', header)
-        sheet.write(line, 4, 'Total Replies', header)
-        line += 1
-        for s in css['subjects']:
-            sheet.write(line, 0, s['name'], normal)
-            sheet.write(line, 1, Formula(n + '("http://' + Site.objects.get_current().domain + str(s['url']) + '","Link")'), normal_link)
-            sheet.write(line, 2, s['author'], normal)
-            sheet.write(line, 3, s['posted_at'], normal)
-            sheet.write(line, 4, s['total_replies'], normal)
-            line += 1
-        line += 1
-        cus = ast.literal_eval(self.closed_unsolved_subjects)
-        sheet.write(line, 0, 'Closed [Unsolved] subjects', subtitle)
-        sheet.write(line, 1, 'Total subjects: ' + str(cus['total']), subtitle)
-        sheet.write(line, 2, 'Total replies: ' + str(cus['replies']), subtitle)
-        line += 2
-        sheet.write(line, 0, 'Name', header)
-        sheet.write(line, 1, 'URL', header)
-        sheet.write(line, 2, 'Author', header)
-        sheet.write(line, 3, 'Posted At', header)
-        sheet.write(line, 4, 'Total Replies', header)
-        line += 1
-        for s in cus['subjects']:
-            sheet.write(line, 0, s['name'], normal)
-            sheet.write(line, 1, Formula(n + '("http://' + Site.objects.get_current().domain + str(s['url']) + '","Link")'), normal_link)
-            sheet.write(line, 2, s['author'], normal)
-            sheet.write(line, 3, s['posted_at'], normal)
-            sheet.write(line, 4, s['total_replies'], normal)
-            line += 1
-        line += 1
-        sheet.write(line, 0, 'Completed iterations', header)
-        for i in self.completed_iterations.all():
-            sheet.write(line, 1, i.name, normal)
-            line += 1
-        line += 2
-        sheet.write(line, 0, 'Upcoming iterations', header)
-        for i in self.upcoming_iterations.all():
-            sheet.write(line, 1, i.name, normal)
-            line += 1
-        wb.save(os.path.join(settings.BASE_DIR, 'tmp/report.xls'))
-        f = open(os.path.join(settings.BASE_DIR, 'tmp/report.xls'), 'r')
-        report_file = File(f)
+        from app.steering.excel import ReportRenderer
+        wb = ReportRenderer(self).render()
+        # the workbook is rendered in a private buffer which only spills to an
+        # anonymous temporary file past REPORT_FILE_MAX_MEMORY_SIZE
+        buffer = SpooledTemporaryFile(max_size=REPORT_FILE_MAX_MEMORY_SIZE)
+        wb.save(buffer)
+        report_file = File(buffer)
+        report_file.size = buffer.tell()
+        buffer.seek(0)
         self.file.save(self.project.name + '_Daily-Report_' + str(self.date) + '.xls', report_file, save=True)
         report_file.close()
-        f.close()
-        os.remove(os.path.join(settings.BASE_DIR, 'tmp/report.xls'))
 
     class Meta:
         verbose_name = u'Report'
@@ -378,11 +444,49 @@ class Report(models.Model):
             ('view_report', 'View report'),
         )
 
-def create_report_permissions(sender, instance, created, **kwargs):
-    group = Group.objects.get(name=instance.project.name)
-    assign('view_report', group, instance)
-                
-post_save.connect(create_report_permissions, sender=Report)
+class ReportSubjectMap(models.Model):
+    """Where each subject of the current iteration appears in a Report's
+    sections, with a fingerprint of what its items show: the next report
+    carries the items of unchanged subjects over (see ReportBuilder)."""
+    report = models.OneToOneField(Report, verbose_name=u'report', related_name=u'subject_map')
+    # subject id -> [fingerprint, section, index in section, index in new subjects]
+    subjects = fields.JSONField(u'subjects', null=True, blank=True)
+
+    def __unicode__(self):
+        return u'Subjects of %s' % (self.report)
+
+    class Meta:
+        verbose_name = u'Report subject map'
+        verbose_name_plural = u'Report subject maps'
+
+post_save.connect(invalidate_project_report_pages, sender=Report)
+post_delete.connect(invalidate_project_report_pages, sender=Report)
+
+class IterationMetrics(models.Model):
+    date = models.DateField(u'date')
+    project = models.ForeignKey(Project, verbose_name=u'project', related_name=u'iteration_metrics')
+    iteration = models.ForeignKey(Iteration, verbose_name=u'iteration', related_name=u'metrics')
+    report = models.ForeignKey(Report, verbose_name=u'report', related_name=u'metrics', null=True, blank=True, on_delete=models.SET_NULL)
+    new_subjects = models.PositiveIntegerField(u'new subjects', default=0)
+    open_subjects = models.PositiveIntegerField(u'open subjects', default=0)
+    closed_solved_subjects = models.PositiveIntegerField(u'closed solved subjects', default=0)
+    closed_unsolved_subjects = models.PositiveIntegerField(u'closed unsolved subjects', default=0)
+    new_replies = models.PositiveIntegerField(u'new subjects replies', default=0)
+    total_replies = models.PositiveIntegerField(u'total replies', default=0)
+
+    def __unicode__(self):
+        return u'%s metrics of %s' % (self.iteration, self.date.strftime("%d/%m/%y"))
+
+    def _get_total_subjects(self):
+        return self.open_subjects + self.closed_solved_subjects + self.closed_unsolved_subjects
+    total_subjects = property(_get_total_subjects)
+
+    class Meta:
+        verbose_name = u'Iteration Metrics'
+        verbose_name_plural = u'Iterations Metrics'
+        # also serves as the (iteration, date) index of the trend range queries
+        unique_together = ('iteration', 'date')
+        ordering = ['date']
         
 def create_state(name, rank, type, icon, verbosity=1):
     try:
@@ -392,105 +496,38 @@ def create_state(name, rank, type, icon, verbosity=1):
         if verbosity == 1:
             print "Created %s State" % name
 
-def generate_report(project):
+def generate_report(project, incremental=False):
+    from app.steering.reports import ReportBuilder, record_iteration_metrics
     today = date.today()
     try:
         report = Report.objects.get(date=today, project=project)
     except Report.DoesNotExist:
         try:
-            current_iteration = Iteration.objects.get(project=project, current=1)
-            new_subjects_list = Subject.objects.filter(iteration=current_iteration, created_at__gte=(today - timedelta(days=2)))
-            new_subjects = {}
-            total_replies = 0
-            subjects = []
-            for ns in new_subjects_list:
-                subjects.append({
-                    'name': ns.name,
-                    'state': ns.state.name,
-                    'url': ns.get_absolute_url(),
-                    'author': ns.author.full_name,
-                    'posted_at': ns.created_at.strftime("%d/%m/%y %H:%M"),
-                    'total_replies': ns.total_replies
-                })
-                total_replies += ns.total_replies
-            new_subjects.update({
-                'total': len(new_subjects_list),
-                'replies': total_replies,
-                'subjects': subjects
-            })
-            open_subjects_list = Subject.objects.filter(iteration=current_iteration, state=State.objects.get(name='Open'))
-            open_subjects = {}
-            total_replies = 0
-            subjects = []
-            for ops in open_subjects_list:
-                subjects.append({
-                    'name': ops.name,
-                    'url': ops.get_absolute_url(),
-                    'author': ops.author.full_name,
-                    'posted_at': ops.created_at.strftime("%d/%m/%y %H:%M"),
-                    'total_replies': ops.total_replies
-                })
-                total_replies += ops.total_replies
-            open_subjects.update({
-                'total': len(open_subjects_list),
-                'replies': total_replies,
-                'subjects': subjects
-            })
-            closed_solved_subjects_list = Subject.objects.filter(iteration=current_iteration, state=State.objects.get(name='Closed [Solved]'))
-            closed_solved_subjects = {}
-            total_replies = 0
-            subjects = []
-            for css in closed_solved_subjects_list:
-                subjects.append({
-                    'name': css.name,
-                    'url': css.get_absolute_url(),
-                    'author': css.author.full_name,
-                    'posted_at': css.created_at.strftime("%d/%m/%y %H:%M"),
-                    'total_replies': css.total_replies
-                })
-                total_replies += css.total_replies
-            closed_solved_subjects.update({
-                'total': len(closed_solved_subjects_list),
-                'replies': total_replies,
-                'subjects': subjects
-            })
-            closed_unsolved_subjects_list = Subject.objects.filter(iteration=current_iteration, state=State.objects.get(name='Closed [Unsolved]'))
-            closed_unsolved_subjects = {}
-            total_replies = 0
-            subjects = []
-            for cus in closed_unsolved_subjects_list:
-                subjects.append({
-                    'name': cus.name,
-                    'url': cus.get_absolute_url(),
-                    'author': cus.author.full_name,
-                    'posted_at': cus.created_at.strftime("%d/%m/%y %H:%M"),
-                    'total_replies': cus.total_replies
-                })
-                total_replies += cus.total_replies
-            closed_unsolved_subjects.update({
-                'total': len(closed_unsolved_subjects_list),
-                'replies': total_replies,
-                'subjects': subjects
-            })
+            current_iteration = get_current_iteration(project)
+            builder = ReportBuilder(project, current_iteration, today)
+            previous = None
+            if incremental:
+                previous = builder.get_previous_report()
+            sections = builder.build_sections(previous)
             report = Report(
                 date=today, 
                 project=project, 
                 current_iteration=current_iteration, 
-                new_subjects=str(new_subjects), 
-                open_subjects=str(open_subjects),
-                closed_solved_subjects=str(closed_solved_subjects),
-                closed_unsolved_subjects=str(closed_unsolved_subjects)
+                new_subjects=sections['new_subjects'], 
+                open_subjects=sections['open_subjects'],
+                closed_solved_subjects=sections['closed_solved_subjects'],
+                closed_unsolved_subjects=sections['closed_unsolved_subjects']
             )
             report.save()
-            for iter in project.iterations.all():
-                if iter.rank > report.current_iteration.rank and iter.state != State.objects.get(name='Finished'):
-                    report.upcoming_iterations.add(iter)
-                if iter.rank < report.current_iteration.rank and iter.state == State.objects.get(name='Finished'):
-                    report.completed_iterations.add(iter)
+            ReportSubjectMap.objects.create(report=report, subjects=builder.subject_map)
+            upcoming_iterations, completed_iterations = builder.split_iterations()
+            if upcoming_iterations:
+                report.upcoming_iterations.add(*upcoming_iterations)
+            if completed_iterations:
+                report.completed_iterations.add(*completed_iterations)
             report.save()
+            record_iteration_metrics(report, sections)
             report.generate_excel_file()
             return report.id
         except:
-            return None
-            
-        
\ No newline at end of file
+            return None
\ No newline at end of file
@@ -0,0 +1,249 @@
+import ast
+from datetime import date, datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.utils import simplejson as json
+from django.utils.hashcompat import md5_constructor
+from app.steering.models import Subject, Report, ReportSubjectMap, IterationMetrics, IterationCounters, SubjectCounters, states
+
+NEW_SUBJECTS_DAYS = 2
+# above this many changed subjects an incremental build is no cheaper than a full one
+MAX_DELTA_SUBJECTS = 500
+SECTIONS = ('new_subjects', 'open_subjects', 'closed_solved_subjects', 'closed_unsolved_subjects')
+STATE_SECTIONS = {
+    'Open': 'open_subjects',
+    'Closed [Solved]': 'closed_solved_subjects',
+    'Closed [Unsolved]': 'closed_unsolved_subjects',
+}
+REPORT_SECTIONS_CACHE_TIMEOUT = getattr(settings, 'REPORT_SECTIONS_CACHE_TIMEOUT', 24 * 3600)
+
+class ReportBuilder(object):
+    """Builds the subject sections of a daily Report.
+
+    All the subjects of the current iteration are fetched in a single query,
+    joined with their author and iteration, then dispatched in memory into the new / open /
+    closed solved / closed unsolved sections.
+
+    The builder also fills ``subject_map``, stored as the ReportSubjectMap of
+    the report: for each subject, a fingerprint of everything its items show
+    and their positions in the sections. Given the previous Report of the
+    same iteration, only the subjects whose fingerprint changed are fetched
+    again, the items of the others are carried over from the previous
+    sections."""
+
+    def __init__(self, project, current_iteration, today=None):
+        self.project = project
+        self.current_iteration = current_iteration
+        self.today = today or date.today()
+        self.subject_map = {}
+
+    def get_subjects(self):
+        return Subject.objects.filter(iteration=self.current_iteration)\
+            .select_related('author__user', 'iteration__project', 'counters')\
+            .order_by('id')
+
+    def get_previous_report(self):
+        try:
+            return Report.objects.filter(project=self.project, current_iteration=self.current_iteration, date__lt=self.today).order_by('-date')[0]
+        except IndexError:
+            return None
+
+    def new_subjects_limit(self):
+        return datetime.combine(self.today - timedelta(days=NEW_SUBJECTS_DAYS), time())
+
+    def subject_item(self, subject, with_state=False):
+        item = {
+            'name': subject.name,
+            'url': subject.get_absolute_url(),
+            'author': subject.author.full_name,
+            'posted_at': subject.created_at.strftime("%d/%m/%y %H:%M"),
+            'total_replies': subject.total_replies
+        }
+        if with_state:
+            item['state'] = states.get_by_id(subject.state_id).name
+        return item
+
+    def add_subject(self, sections, subject_id, fingerprint, new_item, key, item):
+        entry = [fingerprint, key, None, None]
+        if key is not None:
+            entry[2] = len(sections[key])
+            sections[key].append(item)
+        if new_item is not None:
+            entry[3] = len(sections['new_subjects'])
+            sections['new_subjects'].append(new_item)
+        self.subject_map[str(subject_id)] = entry
+
+    def add_built_subject(self, sections, subject, limit):
+        new_item = None
+        if subject.created_at >= limit:
+            new_item = self.subject_item(subject, with_state=True)
+        key = STATE_SECTIONS.get(states.get_by_id(subject.state_id).name)
+        item = None
+        if key is not None:
+            item = self.subject_item(subject)
+        self.add_subject(sections, subject.id, get_subject_fingerprint(subject.updated_at, subject.total_replies,
+            subject.state_id, subject.author.user.first_name, subject.author.user.last_name,
+            subject.iteration.slug, subject.iteration.project.slug), new_item, key, item)
+
+    def build_sections(self, previous=None):
+        if previous is not None:
+            sections = self.build_sections_from(previous)
+            if sections is not None:
+                return sections
+        return self.build_full_sections()
+
+    def build_full_sections(self):
+        self.subject_map = {}
+        sections = dict((key, []) for key in SECTIONS)
+        limit = self.new_subjects_limit()
+        for subject in self.get_subjects():
+            self.add_built_subject(sections, subject, limit)
+        for key, subjects in sections.items():
+            sections[key] = section(subjects)
+        return sections
+
+    def build_sections_from(self, previous):
+        """Returns the sections merged from ``previous`` Report, or ``None``
+        if it cannot be used as a base (other iteration, no subject map,
+        too many changes)."""
+        if previous.current_iteration_id != self.current_iteration.id:
+            return None
+        try:
+            previous_map = previous.subject_map.subjects or {}
+        except ReportSubjectMap.DoesNotExist:
+            return None
+        previous_sections = get_report_sections(previous)
+        limit = self.new_subjects_limit()
+        rows = []
+        changed_ids = set()
+        replies_counts = dict(SubjectCounters.objects.filter(subject__iteration=self.current_iteration).values_list('subject', 'replies_count'))
+        # the same joins as get_subjects, reading only what the fingerprint covers
+        for row in Subject.objects.filter(iteration=self.current_iteration)\
+                .values_list('id', 'created_at', 'updated_at', 'state', 'author__user__first_name',
+                    'author__user__last_name', 'iteration__slug', 'iteration__project__slug')\
+                .order_by('id'):
+            fingerprint = get_subject_fingerprint(row[2], replies_counts.get(row[0], 0), *row[3:])
+            entry = previous_map.get(str(row[0]))
+            if entry is None or entry[0] != fingerprint or (row[1] >= limit and entry[3] is None):
+                changed_ids.add(row[0])
+            rows.append((row[0], row[1], entry))
+        if len(changed_ids) > MAX_DELTA_SUBJECTS:
+            return None
+        changed_subjects = {}
+        if changed_ids:
+            for subject in self.get_subjects().filter(id__in=changed_ids):
+                changed_subjects[subject.id] = subject
+        self.subject_map = {}
+        sections = dict((key, []) for key in SECTIONS)
+        for id, created_at, entry in rows:
+            if id in changed_subjects:
+                self.add_built_subject(sections, changed_subjects[id], limit)
+                continue
+            if id in changed_ids:
+                # deleted meanwhile
+                continue
+            fingerprint, key, index, new_index = entry
+            try:
+                item = None
+                if key is not None:
+                    item = previous_sections[key]['subjects'][index]
+                new_item = None
+                if created_at >= limit:
+                    new_item = previous_sections['new_subjects']['subjects'][new_index]
+            except (KeyError, IndexError, TypeError):
+                # sections and map out of step, e.g. payloads converted since
+                return None
+            self.add_subject(sections, id, fingerprint, new_item, key, item)
+        for key, subjects in sections.items():
+            sections[key] = section(subjects)
+        return sections
+
+    def split_iterations(self):
+        finished = states.get('Finished')
+        upcoming = []
+        completed = []
+        for iteration in self.project.iterations.all():
+            if iteration.rank > self.current_iteration.rank and iteration.state_id != finished.id:
+                upcoming.append(iteration)
+            if iteration.rank < self.current_iteration.rank and iteration.state_id == finished.id:
+                completed.append(iteration)
+        return upcoming, completed
+
+def get_subject_fingerprint(updated_at, replies_count, state_id, author_first_name, author_last_name, iteration_slug, project_slug):
+    """Hash of what the report items of a subject show besides its creation
+    date: its own fields (through updated_at), counters, state, author name
+    and URL."""
+    parts = [updated_at, replies_count, state_id, author_first_name, author_last_name, iteration_slug, project_slug]
+    return md5_constructor(u'|'.join([unicode(part) for part in parts]).encode('utf-8')).hexdigest()
+
+def section(subjects):
+    total_replies = 0
+    for subject in subjects:
+        total_replies += subject['total_replies']
+    return {
+        'total': len(subjects),
+        'replies': total_replies,
+        'subjects': subjects
+    }
+
+def load_section(value):
+    if isinstance(value, basestring):
+        try:
+            return json.loads(value)
+        except ValueError:
+            # reports generated before the JSON storage were saved with str()
+            return ast.literal_eval(value)
+    return value
+
+def report_sections_key(report_id):
+    return 'steering.report_sections.%s' % report_id
+
+def get_report_sections(report):
+    """Returns the decoded subject sections of ``report`` as a dict, keeping
+    them in the cache until the report is saved or deleted. Sections
+    deferred on the given instance are read raw from the database, skipping
+    the JSONField decoding."""
+    sections = None
+    if report.id is not None:
+        sections = cache.get(report_sections_key(report.id))
+    if sections is None:
+        deferred = [key for key in SECTIONS if key not in report.__dict__]
+        if deferred:
+            values = Report.objects.filter(id=report.id).values_list(*SECTIONS)[0]
+        else:
+            values = [getattr(report, key) for key in SECTIONS]
+        sections = dict(zip(SECTIONS, [load_section(value) for value in values]))
+        if report.id is not None:
+            cache.set(report_sections_key(report.id), sections, REPORT_SECTIONS_CACHE_TIMEOUT)
+    return sections
+
+def record_iteration_metrics(report, sections=None, total_replies=None):
+    """Creates or refreshes the IterationMetrics row of ``report``'s day.
+    ``total_replies`` defaults to the stored replies count of the iteration,
+    which covers subjects in every state but is only right for today's
+    report."""
+    if sections is None:
+        sections = get_report_sections(report)
+    if total_replies is None:
+        total_replies = sum(IterationCounters.objects.filter(iteration=report.current_iteration_id).values_list('replies_count', flat=True))
+    try:
+        metrics = IterationMetrics.objects.get(iteration=report.current_iteration_id, date=report.date)
+    except IterationMetrics.DoesNotExist:
+        metrics = IterationMetrics(iteration_id=report.current_iteration_id, date=report.date)
+    metrics.project_id = report.project_id
+    metrics.report = report
+    metrics.new_subjects = sections['new_subjects']['total']
+    metrics.open_subjects = sections['open_subjects']['total']
+    metrics.closed_solved_subjects = sections['closed_solved_subjects']['total']
+    metrics.closed_unsolved_subjects = sections['closed_unsolved_subjects']['total']
+    metrics.new_replies = sections['new_subjects']['replies']
+    metrics.total_replies = total_replies
+    metrics.save()
+    return metrics
+
+def clear_report_sections(sender, instance, **kwargs):
+    cache.delete(report_sections_key(instance.id))
+
+post_save.connect(clear_report_sections, sender=Report)
+post_delete.connect(clear_report_sections, sender=Report)
@@ -0,0 +1,304 @@
+"""Full-text search across subjects, replies and tags.
+
+On SQLite, rows are indexed in the ``steering_search`` FTS4 table, created
+by syncdb (or the ``rebuild_search_index`` command), kept current by
+post_save/post_delete signals and rebuilt by that command. The docid of a row encodes the kind and
+primary key of the indexed object. Other databases (or an SQLite built
+without FTS) fall back to LIKE queries on the models."""
+import re
+import struct
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction, DatabaseError
+from django.db.models import Q
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, post_syncdb
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from django.utils.text import truncate_words
+from app.steering import models as steering
+from app.steering.models import Subject, Reply, Tag
+from thirdparty.guardian.shortcuts import get_objects_for_user
+
+SEARCH_TABLE = 'steering_search'
+SEARCH_MAX_RESULTS = getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+SEARCH_BATCH_SIZE = 500
+# weight of a hit in the title column over one in the content column
+TITLE_WEIGHT = 2.0
+
+SUBJECT, REPLY, TAG = 0, 1, 2
+KINDS = 3
+KIND_NAMES = {SUBJECT: 'subject', REPLY: 'reply', TAG: 'tag'}
+
+# snippet() markers, replaced by HTML once the snippet is escaped
+MATCH_START, MATCH_END = u'\x02', u'\x03'
+
+# by database name, test databases are created within the same process
+_fts_available = {}
+
+def create_search_table():
+    """Creates the FTS table if missing, returns whether FTS is available."""
+    available = False
+    if connection.vendor == 'sqlite':
+        cursor = connection.cursor()
+        for tokenizer in ('unicode61', 'simple'):
+            try:
+                cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts4(title, content, tokenize=%s)' % (SEARCH_TABLE, tokenizer))
+            except DatabaseError:
+                continue
+            transaction.commit_unless_managed()
+            available = True
+            break
+    _fts_available[connection.settings_dict['NAME']] = available
+    return available
+
+def create_search_index(app, created_models, verbosity=1, **kwargs):
+    create_search_table()
+
+post_syncdb.connect(create_search_index, sender=steering)
+
+def use_fts():
+    """Whether the FTS table exists, looked up once per database. It is
+    never created here: this runs from save signals, within the caller's
+    transaction."""
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        _fts_available[name] = connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+    return _fts_available[name]
+
+def get_docid(kind, pk):
+    return pk * KINDS + kind
+
+def split_docid(docid):
+    return docid % KINDS, docid // KINDS
+
+def get_document(obj):
+    """The kind, title and content indexed for ``obj``."""
+    if isinstance(obj, Subject):
+        return SUBJECT, obj.name, strip_tags(obj.content)
+    if isinstance(obj, Reply):
+        return REPLY, obj.title, strip_tags(obj.content)
+    return TAG, obj.name, u''
+
+def index_object(obj):
+    kind, title, content = get_document(obj)
+    cursor = connection.cursor()
+    cursor.execute('DELETE FROM %s WHERE docid = %%s' % SEARCH_TABLE, [get_docid(kind, obj.pk)])
+    cursor.execute('INSERT INTO %s (docid, title, content) VALUES (%%s, %%s, %%s)' % SEARCH_TABLE, [get_docid(kind, obj.pk), title, content])
+
+def unindex_object(obj):
+    kind, title, content = get_document(obj)
+    connection.cursor().execute('DELETE FROM %s WHERE docid = %%s' % SEARCH_TABLE, [get_docid(kind, obj.pk)])
+
+def update_search_index(sender, instance, **kwargs):
+    if use_fts():
+        index_object(instance)
+        transaction.commit_unless_managed()
+
+def clear_search_index(sender, instance, **kwargs):
+    if use_fts():
+        unindex_object(instance)
+        transaction.commit_unless_managed()
+
+for model in (Subject, Reply, Tag):
+    post_save.connect(update_search_index, sender=model)
+    post_delete.connect(clear_search_index, sender=model)
+
+def rebuild_search_index(progress=None):
+    """Indexes all subjects, replies and tags again, returns the number of
+    indexed objects. ``progress`` is called with each model and its count."""
+    if not create_search_table():
+        return 0
+    total = 0
+    with transaction.commit_on_success():
+        cursor = connection.cursor()
+        cursor.execute('DELETE FROM %s' % SEARCH_TABLE)
+        for model in (Subject, Reply, Tag):
+            count = 0
+            rows = []
+            for obj in model.objects.order_by('pk').iterator():
+                kind, title, content = get_document(obj)
+                rows.append((get_docid(kind, obj.pk), title, content))
+                if len(rows) >= SEARCH_BATCH_SIZE:
+                    cursor.executemany('INSERT INTO %s (docid, title, content) VALUES (%%s, %%s, %%s)' % SEARCH_TABLE, rows)
+                    count += len(rows)
+                    rows = []
+            if rows:
+                cursor.executemany('INSERT INTO %s (docid, title, content) VALUES (%%s, %%s, %%s)' % SEARCH_TABLE, rows)
+                count += len(rows)
+            if progress is not None:
+                progress(model, count)
+            total += count
+        # merges the index b-trees written by the inserts
+        cursor.execute("INSERT INTO %s (%s) VALUES ('optimize')" % (SEARCH_TABLE, SEARCH_TABLE))
+        transaction.set_dirty()
+    return total
+
+def get_terms(query):
+    return re.findall(r'\w+', query.lower(), re.UNICODE)
+
+def get_rank(matchinfo):
+    """Score of a row from its matchinfo 'pcx' blob: for each term and
+    column, hits in the row over hits in all rows, title hits weighted."""
+    matchinfo = str(matchinfo)
+    values = struct.unpack('@%dI' % (len(matchinfo) // 4), matchinfo)
+    phrases, columns = values[0], values[1]
+    score = 0.0
+    for phrase in range(phrases):
+        for column in range(columns):
+            hits, all_hits = values[2 + 3 * (phrase * columns + column):][:2]
+            if hits:
+                score += (column == 0 and TITLE_WEIGHT or 1.0) * hits / all_hits
+    return score
+
+def format_snippet(snippet):
+    return mark_safe(escape(snippet).replace(MATCH_START, u'<b>').replace(MATCH_END, u'</b>'))
+
+def get_match_query(terms):
+    return u' '.join([term + u'*' for term in terms])
+
+def iter_documents(terms, user):
+    """Batches of (score, kind, pk, snippet) of the rows matching all
+    ``terms`` as prefixes, best first. With FTS, rows are ranked and paged
+    in SQL and the snippet is None, see get_snippets. Without FTS, only the
+    rows ``user`` may view are read."""
+    if not use_fts():
+        documents = find_documents_like(terms, user)
+        documents.sort(key=lambda document: (-document[0], document[1], -document[2]))
+        for i in xrange(0, len(documents), SEARCH_BATCH_SIZE):
+            yield documents[i:i + SEARCH_BATCH_SIZE]
+        return
+    cursor = connection.cursor()
+    offset = 0
+    while True:
+        cursor.execute("SELECT docid, steering_search_rank(matchinfo(%s, 'pcx')) AS rank FROM %s WHERE %s MATCH %%s "
+            "ORDER BY rank DESC, docid DESC LIMIT %%s OFFSET %%s" % (SEARCH_TABLE, SEARCH_TABLE, SEARCH_TABLE),
+            [get_match_query(terms), SEARCH_BATCH_SIZE, offset])
+        rows = cursor.fetchall()
+        if rows:
+            yield [(rank,) + split_docid(docid) + (None,) for docid, rank in rows]
+        if len(rows) < SEARCH_BATCH_SIZE:
+            return
+        offset += SEARCH_BATCH_SIZE
+
+def register_search_functions(sender, connection, **kwargs):
+    """Registers the ranking function of the FTS query on each new SQLite
+    connection."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('steering_search_rank', 1, get_rank)
+
+connection_created.connect(register_search_functions)
+if connection.connection is not None:
+    # opened before this module was imported
+    register_search_functions(connection.__class__, connection)
+
+def get_snippets(terms, documents):
+    """Snippets of the FTS ``documents`` (kind, pk), by (kind, pk)."""
+    snippets = {}
+    docids = [get_docid(kind, pk) for kind, pk in documents]
+    cursor = connection.cursor()
+    for batch in in_batches(docids):
+        cursor.execute("SELECT docid, snippet(%s, %%s, %%s, '...', -1, 12) FROM %s WHERE %s MATCH %%s AND docid IN (%s)" % (
+            SEARCH_TABLE, SEARCH_TABLE, SEARCH_TABLE, ', '.join(['%s'] * len(batch))),
+            [MATCH_START, MATCH_END, get_match_query(terms)] + batch)
+        for docid, snippet in cursor.fetchall():
+            snippets[split_docid(docid)] = format_snippet(snippet)
+    return snippets
+
+def find_documents_like(terms, user):
+    """LIKE based equivalent of the FTS query: each term in the title counts
+    TITLE_WEIGHT, in the content one. Rows ``user`` may not view are
+    filtered out in the query, before it is limited."""
+    documents = []
+    allowed = get_allowed_subjects(user).values('pk')
+    subject_type = ContentType.objects.get_for_model(Subject)
+    for kind, queryset, title_field, content_field in (
+            (SUBJECT, Subject.objects.filter(pk__in=allowed), 'name', 'content'),
+            (REPLY, Reply.objects.filter(subject__in=allowed), 'title', 'content'),
+            (TAG, Tag.objects.filter(content_type=subject_type, object_id__in=allowed), 'name', None)):
+        for term in terms:
+            q = Q(**{title_field + '__icontains': term})
+            if content_field:
+                q |= Q(**{content_field + '__icontains': term})
+            queryset = queryset.filter(q)
+        fields = content_field and ('pk', title_field, content_field) or ('pk', title_field)
+        for row in queryset.values_list(*fields).order_by('-pk')[:SEARCH_MAX_RESULTS * 5]:
+            title = row[1].lower()
+            content = len(row) > 2 and strip_tags(row[2]) or u''
+            score = sum([TITLE_WEIGHT * (term in title) + (term in content.lower()) for term in terms])
+            documents.append((score, kind, row[0], truncate_words(content, 25)))
+    return documents
+
+def get_allowed_subjects(user):
+    """Subjects ``user`` may view: those of projects they can view (see
+    app.frontend.backends.INHERITED_PERMISSIONS) and those given to them."""
+    return Subject.objects.filter(Q(iteration__project__in=get_objects_for_user(user, 'core.view_project')) |
+        Q(pk__in=get_objects_for_user(user, 'steering.view_subject')))
+
+def in_batches(pks):
+    for i in xrange(0, len(pks), SEARCH_BATCH_SIZE):
+        yield pks[i:i + SEARCH_BATCH_SIZE]
+
+def get_subject_ids(documents):
+    """The subject each of ``documents`` (score, kind, pk, snippet) belongs
+    to, by (kind, pk)."""
+    subject_ids = {}
+    pks = dict((kind, [pk for score, document_kind, pk, snippet in documents if document_kind == kind]) for kind in KIND_NAMES)
+    for pk in pks[SUBJECT]:
+        subject_ids[(SUBJECT, pk)] = pk
+    for batch in in_batches(pks[REPLY]):
+        for pk, subject_id in Reply.objects.filter(pk__in=batch).values_list('pk', 'subject'):
+            subject_ids[(REPLY, pk)] = subject_id
+    subject_type = ContentType.objects.get_for_model(Subject)
+    for batch in in_batches(pks[TAG]):
+        for pk, subject_id in Tag.objects.filter(pk__in=batch, content_type=subject_type).values_list('pk', 'object_id'):
+            subject_ids[(TAG, pk)] = subject_id
+    return subject_ids
+
+def search(user, query, limit=SEARCH_MAX_RESULTS):
+    """Subjects, replies and tags matching ``query`` which ``user`` may view,
+    best first. Each result is a dict with the matched ``kind``, its
+    ``score``, the ``subject`` it belongs to (and ``reply`` for replies),
+    its ``title`` and a ``snippet``. Matches are read in ranked batches
+    until ``limit`` of them are allowed."""
+    terms = get_terms(query)
+    if not terms:
+        return []
+    matches = []
+    subject_ids = {}
+    for documents in iter_documents(terms, user):
+        batch_subject_ids = get_subject_ids(documents)
+        subject_ids.update(batch_subject_ids)
+        allowed = set(get_allowed_subjects(user).filter(pk__in=set(batch_subject_ids.values())).values_list('pk', flat=True))
+        for score, kind, pk, snippet in documents:
+            if batch_subject_ids.get((kind, pk)) in allowed:
+                matches.append((score, kind, pk, snippet))
+                if len(matches) >= limit:
+                    break
+        if len(matches) >= limit:
+            break
+    if use_fts():
+        snippets = get_snippets(terms, [(kind, pk) for score, kind, pk, snippet in matches])
+        matches = [(score, kind, pk, snippets.get((kind, pk), u'')) for score, kind, pk, snippet in matches]
+    subjects = Subject.objects.select_related('iteration__project').in_bulk(set([subject_ids[(kind, pk)] for score, kind, pk, snippet in matches]))
+    replies = Reply.objects.in_bulk([pk for score, kind, pk, snippet in matches if kind == REPLY])
+    tags = Tag.objects.in_bulk([pk for score, kind, pk, snippet in matches if kind == TAG])
+    results = []
+    for score, kind, pk, snippet in matches:
+        subject = subjects.get(subject_ids[(kind, pk)])
+        if subject is None:
+            continue
+        result = {'kind': KIND_NAMES[kind], 'score': score, 'subject': subject, 'reply': None, 'snippet': snippet}
+        if kind == REPLY:
+            if pk not in replies:
+                continue
+            result['reply'] = replies[pk]
+            result['title'] = replies[pk].title
+        elif kind == TAG:
+            if pk not in tags:
+                continue
+            result['title'] = u'%s (tag %s)' % (subject.name, tags[pk].name)
+        else:
+            result['title'] = subject.name
+        results.append(result)
+    return results
@@ -1,6 +1,6 @@
-from datetime import date
-import calendar
 from django import template
+from django.core.cache import cache
+from app.steering.timetable import get_timetable, get_timetable_cache_key, TIMETABLE_CACHE_TIMEOUT
 
 register = template.Library()
 
@@ -15,67 +15,24 @@ def get_planning_elements(parser, token):
     return TimetableNode(events_list)
 
 class TimetableNode(template.Node):
+    """Renders the timetable of the given iterations. The HTML is cached under
+    a key built from the iterations' names and dates, so pages with long
+    histories do not rebuild their day cells on every request."""
+    compiled_template = None
+
     def __init__(self, events_list):
         self.events_list = template.Variable(events_list)
+
+    def get_template(self):
+        if TimetableNode.compiled_template is None:
+            TimetableNode.compiled_template = template.loader.get_template('templatetags/timetable.html')
+        return TimetableNode.compiled_template
+
     def render(self, context):
-        start_date = date.today()
-        end_date = date.today()
-        elements_list = []
-        for event in self.events_list.resolve(context):
-            element = {}
-            element['name'] = event.name
-            if event.has_provisional_timetable():
-                element['provisional_start_date'] = event.provisional_start_date
-                element['provisional_end_date'] = event.provisional_end_date
-                element['timetable'] = 0
-            if event.has_effective_timetable():
-                element['effective_start_date'] = event.effective_start_date
-                element['effective_end_date'] = event.effective_end_date
-                element['timetable'] = 1
-            if event.has_timetable() == 'complete':
-                element['rowspan'] = 2
-            else:
-                element['rowspan'] = 1
-            if event.provisional_start_date and event.provisional_start_date < start_date:
-                start_date =  event.provisional_start_date
-            if event.effective_start_date and event.effective_start_date < start_date:
-                start_date =  event.effective_start_date
-            if event.provisional_end_date and event.provisional_end_date > end_date:
-                end_date =  event.provisional_end_date
-            if event.effective_end_date and event.effective_end_date > end_date:
-                end_date =  event.effective_end_date
-            elements_list.append(element)
-        first_month = start_date.month
-        last_month = end_date.month
-        first_year = start_date.year
-        last_year = end_date.year
-        timetable_headers = []
-        m = 0
-        y = 0
-        current_month = first_month + m
-        current_year = first_year + y
-        while True:
-            current_month += m
-            if current_month > 12:
-                current_month = 1
-                m = 0
-                y += 1
-            current_year += y
-            month = {}
-            month['name'] = date(current_year, current_month, 1).strftime('%B').capitalize()
-            month['month'] = current_month
-            month['year'] = current_year
-            days = []
-            for week in calendar.monthcalendar(current_year, current_month):
-                for day in week:
-                    if day >= 1 and day <= 31:
-                        current_day = date(current_year, current_month, day)
-                        days.append(current_day)              
-            month['days'] = days 
-            timetable_headers.append(month)
-            m = 1
-            if current_month >= last_month and current_year >= last_year:
-                break
-        t = template.loader.get_template('templatetags/timetable.html')
-        return t.render(template.Context({'timetable_headers': timetable_headers, 'elements_list': elements_list}, autoescape=context.autoescape))
-    
+        timetable = get_timetable(self.events_list.resolve(context))
+        key = '%s.%d' % (get_timetable_cache_key(timetable), context.autoescape and 1 or 0)
+        content = cache.get(key)
+        if content is None:
+            content = self.get_template().render(template.Context(timetable, autoescape=context.autoescape))
+            cache.set(key, content, TIMETABLE_CACHE_TIMEOUT)
+        return content
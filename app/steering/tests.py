@@ -5,7 +5,16 @@ when you run "manage.py test".
 Replace this with more appropriate tests for your application.
 """
 
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from django.db import connection
 from django.test import TestCase
+from django.test.client import Client
+from app.core.models import Project, ProjectActor, ProjectRole
+from app.steering.models import State, Iteration, Subject, Reply, Report, ReportSubjectMap, StateRegistry, states, get_report_pages_version
+from app.steering.reports import ReportBuilder, SECTIONS, get_report_sections, record_iteration_metrics
+from app.steering import search
 
 
 class SimpleTest(TestCase):
@@ -14,3 +23,289 @@ class SimpleTest(TestCase):
         Tests that 1 + 1 always equals 2.
         """
         self.assertEqual(1 + 1, 2)
+
+
+class SteeringTestCase(TestCase):
+    """A project with two actors and a current iteration holding subjects in
+    every subject state, some of them recent and some with replies."""
+
+    def setUp(self):
+        states.clear()
+        for rank, (name, type) in enumerate(settings.STEERING_STATES):
+            State.objects.create(name=name, rank=rank, type=type, icon='states_icon/%d.png' % rank)
+        self.user = User.objects.create(username='joe', first_name='Joe', last_name='Doe')
+        self.other_user = User.objects.create(username='jane', first_name='Jane', last_name='Roe')
+        self.project = Project.objects.create(name='Persona', description='Persona project')
+        role = ProjectRole.objects.create(name='dev', description='Developer')
+        self.actor = ProjectActor.objects.create(project=self.project, user=self.user)
+        self.actor.project_roles.add(role)
+        self.other_actor = ProjectActor.objects.create(project=self.project, user=self.other_user)
+        self.other_actor.project_roles.add(role)
+        self.iteration = Iteration.objects.create(name='Iteration 1', rank=1, description='First iteration',
+            state=State.objects.get(name='On Going'), project=self.project, current=True)
+        subject_states = list(State.objects.filter(type='subject').order_by('rank'))
+        for i in range(9):
+            subject = Subject.objects.create(name='Subject %d' % i, content='Content %d' % i,
+                author=i % 2 and self.actor or self.other_actor, state=subject_states[i % 3], iteration=self.iteration)
+            for j in range(i % 3):
+                Reply.objects.create(title='Reply %d' % j, content='Reply', author=self.actor, subject=subject)
+            if i % 4 == 0:
+                Subject.objects.filter(pk=subject.pk).update(created_at=datetime.now() - timedelta(days=5))
+
+
+def build_sections_per_state(iteration, today):
+    """The sections as they were built before ReportBuilder, with one query
+    per state and per subject."""
+    def item(subject, with_state=False):
+        data = {
+            'name': subject.name,
+            'url': subject.get_absolute_url(),
+            'author': subject.author.full_name,
+            'posted_at': subject.created_at.strftime("%d/%m/%y %H:%M"),
+            'total_replies': subject.replies.count()
+        }
+        if with_state:
+            data['state'] = subject.state.name
+        return data
+    def section(subjects):
+        return {
+            'total': len(subjects),
+            'replies': sum([subject['total_replies'] for subject in subjects]),
+            'subjects': subjects
+        }
+    sections = {'new_subjects': section([item(subject, True) for subject in
+        Subject.objects.filter(iteration=iteration, created_at__gte=today - timedelta(days=2)).order_by('id')])}
+    for key, name in (('open_subjects', 'Open'), ('closed_solved_subjects', 'Closed [Solved]'), ('closed_unsolved_subjects', 'Closed [Unsolved]')):
+        sections[key] = section([item(subject) for subject in
+            Subject.objects.filter(iteration=iteration, state__name=name).order_by('id')])
+    return sections
+
+
+class ReportBuilderTest(SteeringTestCase):
+
+    def test_sections_match_per_state_queries(self):
+        today = date.today()
+        sections = ReportBuilder(self.project, self.iteration, today).build_sections()
+        self.assertEqual(sorted(sections.keys()), sorted(SECTIONS))
+        self.assertEqual(sections, build_sections_per_state(self.iteration, today))
+
+
+class IncrementalReportTest(SteeringTestCase):
+
+    def create_report(self, day, previous=None):
+        builder = ReportBuilder(self.project, self.iteration, day)
+        sections = builder.build_sections(previous)
+        report = Report.objects.create(date=day, project=self.project, current_iteration=self.iteration, **sections)
+        ReportSubjectMap.objects.create(report=report, subjects=builder.subject_map)
+        return report, builder
+
+    def assertMatchesFullBuild(self, previous, today):
+        builder = ReportBuilder(self.project, Iteration.objects.get(pk=self.iteration.pk), today)
+        sections = builder.build_sections_from(previous)
+        self.assertNotEqual(sections, None)
+        full_builder = ReportBuilder(self.project, Iteration.objects.get(pk=self.iteration.pk), today)
+        self.assertEqual(sections, full_builder.build_full_sections())
+        self.assertEqual(builder.subject_map, full_builder.subject_map)
+
+    def test_unchanged_subjects_are_carried_over(self):
+        today = date.today()
+        previous, builder = self.create_report(today - timedelta(days=1))
+        previous = Report.objects.get(pk=previous.pk)
+        get_report_sections(previous)
+        # subject map, replies counters and fingerprints, no subject is fetched again
+        with self.assertNumQueries(3):
+            ReportBuilder(self.project, self.iteration, today).build_sections_from(previous)
+        self.assertMatchesFullBuild(previous, today)
+
+    def test_changes_since_previous_report(self):
+        today = date.today()
+        previous, builder = self.create_report(today - timedelta(days=1))
+        subjects = list(Subject.objects.order_by('id'))
+        subjects[0].name = 'Renamed subject'
+        subjects[0].save()
+        subjects[1].state = State.objects.get(name='Closed [Unsolved]')
+        subjects[1].save()
+        Reply.objects.create(title='New reply', content='Reply', author=self.actor, subject=subjects[2])
+        subjects[3].delete()
+        # posted within the same minute as another subject
+        Subject.objects.create(name='Subject 9', content='Content', author=self.actor, state=subjects[1].state, iteration=self.iteration)
+        Subject.objects.create(name='Subject 10', content='Content', author=self.actor, state=subjects[1].state, iteration=self.iteration)
+        self.assertMatchesFullBuild(previous, today)
+
+    def test_renamed_author_and_iteration(self):
+        today = date.today()
+        previous, builder = self.create_report(today - timedelta(days=1))
+        self.user.first_name = 'Joseph'
+        self.user.save()
+        self.assertMatchesFullBuild(previous, today)
+        iteration = Iteration.objects.get(pk=self.iteration.pk)
+        iteration.name = 'Renamed iteration'
+        iteration.save()
+        self.assertMatchesFullBuild(previous, today)
+
+    def test_subjects_leaving_new_subjects(self):
+        today = date.today()
+        previous, builder = self.create_report(today - timedelta(days=1))
+        self.assertMatchesFullBuild(previous, today + timedelta(days=3))
+
+    def test_previous_report_without_subject_map(self):
+        today = date.today()
+        previous, builder = self.create_report(today - timedelta(days=1))
+        ReportSubjectMap.objects.filter(report=previous).delete()
+        previous = Report.objects.get(pk=previous.pk)
+        self.assertEqual(ReportBuilder(self.project, self.iteration, today).build_sections_from(previous), None)
+
+
+class IterationMetricsTest(SteeringTestCase):
+
+    def test_total_replies_covers_every_state(self):
+        today = date.today()
+        subject = Subject.objects.create(name='Not in a section', content='Content', author=self.actor,
+            state=State.objects.get(name='On Going'), iteration=self.iteration)
+        Reply.objects.create(title='Reply', content='Reply', author=self.actor, subject=subject)
+        sections = ReportBuilder(self.project, self.iteration, today).build_sections()
+        report = Report.objects.create(date=today, project=self.project, current_iteration=self.iteration, **sections)
+        metrics = record_iteration_metrics(report, sections)
+        self.assertEqual(metrics.total_replies, Reply.objects.count())
+
+
+
+class StateRegistryTest(SteeringTestCase):
+
+    def test_other_processes_reload_changed_states(self):
+        # a registry of another process, sharing only the cache
+        other = StateRegistry()
+        self.assertEqual(other.get('Open').icon, 'states_icon/3.png')
+        subjects = list(Subject.objects.all())
+        with self.assertNumQueries(0):
+            other.get('Open')
+            other.attach(subjects)
+        state = State.objects.get(name='Open')
+        state.icon = 'states_icon/open.png'
+        state.save()
+        self.assertEqual(other.get('Open').icon, 'states_icon/open.png')
+        self.assertEqual(states.get('Open').icon, 'states_icon/open.png')
+
+class CountersTest(SteeringTestCase):
+
+    def assertCounters(self):
+        for subject in Subject.objects.all():
+            self.assertEqual(subject.total_replies, subject.replies.count())
+        iteration = Iteration.objects.get(pk=self.iteration.pk)
+        self.assertEqual(iteration.total_subjects, iteration.subjects.count())
+        self.assertEqual(iteration.total_replies, Reply.objects.filter(subject__iteration=iteration).count())
+
+    def test_stale_copies_do_not_overwrite_counters(self):
+        subject = Subject.objects.order_by('id')[0]
+        stale_subject = Subject.objects.get(pk=subject.pk)
+        stale_iteration = Iteration.objects.get(pk=self.iteration.pk)
+        Reply.objects.create(title='Reply', content='Reply', author=self.actor, subject=subject)
+        stale_subject.name = 'Renamed subject'
+        stale_subject.save()
+        stale_iteration.description = 'Changed'
+        stale_iteration.save()
+        self.assertCounters()
+
+    def test_moves_and_deletions(self):
+        other = Iteration.objects.create(name='Iteration 2', rank=2, description='Second iteration',
+            state=State.objects.get(name='Not Started Yet'), project=self.project)
+        subjects = list(Subject.objects.order_by('id'))
+        subjects[2].iteration = other
+        subjects[2].save()
+        reply = Reply.objects.filter(subject=subjects[1])[0]
+        reply.subject = subjects[4]
+        reply.save()
+        subjects[5].delete()
+        self.assertCounters()
+        self.assertEqual(Iteration.objects.get(pk=other.pk).total_replies, subjects[2].replies.count())
+
+    def test_saving_does_not_read_counters(self):
+        subject = Subject.objects.select_related('iteration').get(pk=Subject.objects.order_by('id')[0].pk)
+        subject.name = 'Renamed subject'
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            subject.save()
+            queries = [query['sql'] for query in connection.queries[start:]]
+        finally:
+            connection.use_debug_cursor = None
+        self.assertEqual([sql for sql in queries if 'counters' in sql], [])
+        self.assertEqual(len([sql for sql in queries if sql.startswith('SELECT') and 'steering_subject' in sql]), 1)
+
+
+class ReportPagesTest(SteeringTestCase):
+
+    def setUp(self):
+        super(ReportPagesTest, self).setUp()
+        self.report = Report.objects.create(date=date.today(), project=self.project, current_iteration=self.iteration,
+            file='report_files/Persona_Daily-Report.xls', **ReportBuilder(self.project, self.iteration, date.today()).build_full_sections())
+        admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        admin.set_password('admin')
+        admin.save()
+        self.client = Client()
+        self.client.login(username='admin', password='admin')
+
+    def assertVersionChanges(self, change):
+        version = get_report_pages_version(self.project.id)
+        change()
+        self.assertNotEqual(get_report_pages_version(self.project.id), version)
+
+    def test_version_follows_what_the_pages_show(self):
+        subject = Subject.objects.order_by('id')[0]
+        version = get_report_pages_version(self.project.id)
+        self.assertEqual(get_report_pages_version(self.project.id), version)
+        subject.name = 'Renamed subject'
+        subject.save()
+        self.assertEqual(get_report_pages_version(self.project.id), version)
+        self.assertVersionChanges(lambda: Reply.objects.create(title='Reply', content='Reply', author=self.actor, subject=subject))
+        self.assertVersionChanges(lambda: Reply.objects.filter(subject=subject)[0].delete())
+        self.assertVersionChanges(lambda: Subject.objects.create(name='Subject', content='Content', author=self.actor,
+            state=subject.state, iteration=self.iteration))
+        self.assertVersionChanges(self.iteration.save)
+        self.assertVersionChanges(self.project.save)
+        self.assertVersionChanges(self.report.save)
+
+    def test_cached_response_keeps_headers(self):
+        url = self.report.get_absolute_url()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Reply.objects.create(title='Reply', content='Reply', author=self.actor, subject=Subject.objects.all()[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class SearchTest(SteeringTestCase):
+
+    def setUp(self):
+        super(SearchTest, self).setUp()
+        self.user.groups.add(Group.objects.get(name=self.project.name))
+        Subject.objects.filter(pk=Subject.objects.order_by('id')[0].pk).update(name='Database migration')
+        # more recent matches, of a project the user cannot view
+        other_project = Project.objects.create(name='Other', description='Other project')
+        other_iteration = Iteration.objects.create(name='Iteration 1', rank=1, description='First iteration',
+            state=self.iteration.state, project=other_project, current=True)
+        for i in range(10):
+            Subject.objects.create(name='Database migration %d' % i, content='Content', author=self.other_actor,
+                state=State.objects.get(name='Open'), iteration=other_iteration)
+
+    def test_like_fallback_filters_permissions_before_limiting(self):
+        name = connection.settings_dict['NAME']
+        fts_available = search._fts_available.get(name)
+        max_results = search.SEARCH_MAX_RESULTS
+        search._fts_available[name] = False
+        search.SEARCH_MAX_RESULTS = 1
+        try:
+            results = search.search(self.user, 'database migration')
+            outsider_results = search.search(User.objects.create(username='outsider'), 'database migration')
+        finally:
+            search.SEARCH_MAX_RESULTS = max_results
+            if fts_available is None:
+                del search._fts_available[name]
+            else:
+                search._fts_available[name] = fts_available
+        self.assertEqual([result['title'] for result in results], ['Database migration'])
+        self.assertEqual(outsider_results, [])
@@ -0,0 +1,206 @@
+import calendar
+import glob
+import os
+import tempfile
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.utils.hashcompat import md5_constructor
+from django.utils.html import escape
+from app.steering.models import Iteration
+
+TIMETABLE_CACHE_TIMEOUT = getattr(settings, 'TIMETABLE_CACHE_TIMEOUT', 24 * 3600)
+TIMETABLE_SVG_DIR = getattr(settings, 'TIMETABLE_SVG_DIR', os.path.join(settings.MEDIA_ROOT, 'timetables'))
+DATE_FIELDS = ('provisional_start_date', 'provisional_end_date', 'effective_start_date', 'effective_end_date')
+
+def get_timetable_element(event):
+    """The row(s) of an Iteration in the timetable: its name, its dates and
+    whether provisional (0) or effective (1) dates are shown when only one
+    of them is complete."""
+    element = {'name': event.name}
+    provisional = event.has_provisional_timetable()
+    effective = event.has_effective_timetable()
+    if provisional:
+        element['provisional_start_date'] = event.provisional_start_date
+        element['provisional_end_date'] = event.provisional_end_date
+        element['timetable'] = 0
+    if effective:
+        element['effective_start_date'] = event.effective_start_date
+        element['effective_end_date'] = event.effective_end_date
+        element['timetable'] = 1
+    element['rowspan'] = provisional and effective and 2 or 1
+    return element
+
+def get_timetable_range(events, today=None):
+    """First and last day shown for ``events``, today is always included."""
+    start_date = end_date = today or date.today()
+    for event in events:
+        for field in DATE_FIELDS:
+            value = getattr(event, field)
+            if value is not None:
+                start_date = min(start_date, value)
+                end_date = max(end_date, value)
+    return start_date, end_date
+
+def get_timetable_headers(start_date, end_date):
+    """The months, with all their days, from ``start_date`` month to
+    ``end_date`` month. Kept in the cache, keyed by the months of the
+    range."""
+    key = 'steering.timetable_headers.%d.%d.%d.%d' % (start_date.year, start_date.month, end_date.year, end_date.month)
+    headers = cache.get(key)
+    if headers is None:
+        headers = []
+        year, month = start_date.year, start_date.month
+        while (year, month) <= (end_date.year, end_date.month):
+            headers.append({
+                'name': date(year, month, 1).strftime('%B').capitalize(),
+                'month': month,
+                'year': year,
+                'days': [date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+            })
+            year, month = month == 12 and (year + 1, 1) or (year, month + 1)
+        cache.set(key, headers, TIMETABLE_CACHE_TIMEOUT)
+    return headers
+
+def get_timetable(events, today=None):
+    """Everything the timetable of ``events`` (Iterations) is drawn from."""
+    start_date, end_date = get_timetable_range(events, today)
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'timetable_headers': get_timetable_headers(start_date, end_date),
+        'elements_list': [get_timetable_element(event) for event in events],
+    }
+
+def get_elements_digest_parts(timetable):
+    """What the digests hash of the iterations of ``timetable`` data."""
+    parts = []
+    for element in timetable['elements_list']:
+        parts.append(element['name'])
+        parts.extend([element.get(field) for field in DATE_FIELDS])
+    return parts
+
+def get_digest(parts):
+    return md5_constructor(u'|'.join([unicode(part) for part in parts]).encode('utf-8')).hexdigest()
+
+def get_timetable_digest(timetable):
+    """Hash of ``timetable`` data: it changes whenever an iteration is
+    renamed or rescheduled, or the range moves."""
+    return get_digest([timetable['start_date'], timetable['end_date']] + get_elements_digest_parts(timetable))
+
+def get_timetable_svg_digest(timetable):
+    """Hash of the iterations of ``timetable`` data only: the SVG is drawn
+    over their own dates, not the range including today."""
+    return get_digest(get_elements_digest_parts(timetable))
+
+def get_timetable_cache_key(timetable):
+    """Cache key of the timetable rendered from ``timetable`` data."""
+    return 'steering.timetable.%s' % get_timetable_digest(timetable)
+
+def timetable_to_json(timetable):
+    """``timetable`` data as JSON serializable dict, months only list their
+    number of days."""
+    def element_to_json(element):
+        data = dict(element)
+        for field in DATE_FIELDS:
+            if field in data:
+                data[field] = data[field].strftime('%Y-%m-%d')
+        return data
+    return {
+        'start_date': timetable['start_date'].strftime('%Y-%m-%d'),
+        'end_date': timetable['end_date'].strftime('%Y-%m-%d'),
+        'months': [{
+            'name': month['name'],
+            'month': month['month'],
+            'year': month['year'],
+            'days': len(month['days'])
+        } for month in timetable['timetable_headers']],
+        'elements': [element_to_json(element) for element in timetable['elements_list']],
+    }
+
+# SVG timetable layout, in pixels
+SVG_NAME_WIDTH = 160
+SVG_DAY_WIDTH = 6
+SVG_HEADER_HEIGHT = 24
+SVG_ROW_HEIGHT = 24
+SVG_BAR_HEIGHT = 8
+
+def render_timetable_svg(timetable):
+    """Draws ``timetable`` data as an SVG Gantt chart: one row per iteration
+    with its provisional range above its effective one. Unlike the HTML
+    timetable, the months shown only span the iterations' dates."""
+    dates = [element[field] for element in timetable['elements_list'] for field in DATE_FIELDS if field in element]
+    if dates:
+        headers = get_timetable_headers(min(dates), max(dates))
+    else:
+        headers = timetable['timetable_headers']
+    start_date = headers[0]['days'][0]
+    days = sum([len(month['days']) for month in headers])
+    width = SVG_NAME_WIDTH + days * SVG_DAY_WIDTH
+    height = SVG_HEADER_HEIGHT + len(timetable['elements_list']) * SVG_ROW_HEIGHT
+    svg = [
+        u'<?xml version="1.0" encoding="UTF-8"?>',
+        u'<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif" font-size="11">' % (width, height),
+        u'<rect width="%d" height="%d" fill="#ffffff"/>' % (width, height),
+    ]
+    x = SVG_NAME_WIDTH
+    for month in headers:
+        month_width = len(month['days']) * SVG_DAY_WIDTH
+        svg.append(u'<rect x="%d" y="0" width="%d" height="%d" fill="none" stroke="#cccccc"/>' % (x, month_width, height))
+        svg.append(u'<text x="%d" y="16">%s %d</text>' % (x + 4, escape(month['name']), month['year']))
+        x += month_width
+    for row, element in enumerate(timetable['elements_list']):
+        y = SVG_HEADER_HEIGHT + row * SVG_ROW_HEIGHT
+        svg.append(u'<text x="4" y="%d">%s</text>' % (y + 16, escape(element['name'])))
+        for kind, offset, color in (('provisional', 3, '#9ec5e8'), ('effective', 13, '#3d7ab8')):
+            start, end = element.get(kind + '_start_date'), element.get(kind + '_end_date')
+            if start is None or end is None:
+                continue
+            svg.append(u'<rect class="%s" x="%d" y="%d" width="%d" height="%d" fill="%s"><title>%s: %s - %s</title></rect>' % (
+                kind, SVG_NAME_WIDTH + (start - start_date).days * SVG_DAY_WIDTH, y + offset,
+                ((end - start).days + 1) * SVG_DAY_WIDTH, SVG_BAR_HEIGHT, color, kind.capitalize(),
+                start.strftime('%d/%m/%y'), end.strftime('%d/%m/%y')))
+    svg.append(u'</svg>')
+    return u'\n'.join(svg).encode('utf-8')
+
+def get_timetable_svg_path(project_id, timetable):
+    return os.path.join(TIMETABLE_SVG_DIR, '%s-%s.svg' % (project_id, get_timetable_svg_digest(timetable)))
+
+def get_timetable_svg(project_id, timetable):
+    """Path of the SVG drawn from ``timetable`` data of a project, rendered
+    on first request then kept on disk until an iteration of the project
+    changes. Writing it removes the project's SVGs of older data."""
+    path = get_timetable_svg_path(project_id, timetable)
+    if not os.path.exists(path):
+        if not os.path.isdir(TIMETABLE_SVG_DIR):
+            try:
+                os.makedirs(TIMETABLE_SVG_DIR)
+            except OSError:
+                # created meanwhile by another process
+                pass
+        # written aside then renamed, readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(suffix='.svg', dir=TIMETABLE_SVG_DIR)
+        try:
+            os.write(fd, render_timetable_svg(timetable))
+        finally:
+            os.close(fd)
+        os.rename(tmp_path, path)
+        remove_timetable_svgs(project_id, keep=path)
+    return path
+
+def remove_timetable_svgs(project_id, keep=None):
+    for path in glob.glob(os.path.join(TIMETABLE_SVG_DIR, '%s-*.svg' % project_id)):
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # removed meanwhile by another process
+            pass
+
+def clear_timetable_svg(sender, instance, **kwargs):
+    remove_timetable_svgs(instance.project_id)
+
+post_save.connect(clear_timetable_svg, sender=Iteration)
+post_delete.connect(clear_timetable_svg, sender=Iteration)
@@ -1,10 +1,14 @@
 from django.conf.urls.defaults import patterns, url
-from app.steering.views import IterationDetailView, SubjectCreateView, SubjectDetailView, ReplyCreateView, ReportListView, ReportDetailView
+from app.steering.views import IterationDetailView, SubjectCreateView, SubjectDetailView, ReplyCreateView, ReportListView, ReportDetailView, IterationMetricsView, ProjectTimetableView, ProjectTimetableSvgView, IterationTimetableView
 
 urlpatterns = patterns('',
     url(r'^reports/$', ReportListView.as_view(), name="reports-list"),
     url(r'^reports/(?P<report_id>\d+)/$', ReportDetailView.as_view(), name="report-detail"),
+    url(r'^timetable/$', ProjectTimetableView.as_view(), name="project-timetable"),
+    url(r'^timetable\.svg$', ProjectTimetableSvgView.as_view(), name="project-timetable-svg"),
     url(r'^(?P<iteration_slug>[-\w]+)/$', IterationDetailView.as_view(), name="iteration-detail"),
+    url(r'^(?P<iteration_slug>[-\w]+)/timetable/$', IterationTimetableView.as_view(), name="iteration-timetable"),
+    url(r'^(?P<iteration_slug>[-\w]+)/metrics/$', IterationMetricsView.as_view(), name="iteration-metrics"),
     url(r'^(?P<iteration_slug>[-\w]+)/subjects/add/$', SubjectCreateView.as_view(), name="subject-create"),
     url(r'^(?P<iteration_slug>[-\w]+)/subjects/(?P<subject_id>\d+)/(?P<subject_slug>[-\w]+)/$', SubjectDetailView.as_view(), name="subject-detail"),
     url(r'^(?P<iteration_slug>[-\w]+)/subjects/(?P<subject_id>\d+)/(?P<subject_slug>[-\w]+)/reply/add/$', ReplyCreateView.as_view(), name="reply-create"),
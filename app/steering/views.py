@@ -1,55 +1,136 @@
-import ast
-from django.views.generic import ListView, DetailView, CreateView
+from datetime import date, datetime
+from time import mktime
+from django.views.generic import View, ListView, DetailView, CreateView
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotModified
+from django.core.cache import cache
+from django.utils.hashcompat import md5_constructor
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.utils import simplejson as json
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.exceptions import ImproperlyConfigured
 from app.frontend.views import PermissionRequiredMixin
-from app.core.models import Project, ProjectActor
-from app.steering.models import Iteration, Subject, Tag, State, Reply, Report
+from app.steering.models import Iteration, Subject, Tag, Reply, Report, IterationMetrics, states, get_report_pages_version
 from app.steering.forms import SubjectForm, ReplyForm
+from app.steering.reports import SECTIONS, get_report_sections
+from app.steering.timetable import get_timetable, get_timetable_svg_digest, get_timetable_svg, timetable_to_json
 
-class ReportListView(PermissionRequiredMixin, ListView):
+REPORT_CACHE_TIMEOUT = getattr(settings, 'REPORT_CACHE_TIMEOUT', 24 * 3600)
+
+class CachedResponseMixin(object):
+    """Answers GET requests with ETag/Last-Modified headers, a 304 when the
+    client copy is still valid and otherwise the rendered response cached
+    under the ETag. ``get_etag_parts`` must list everything the page depends
+    on, cheaply: a version key rather than the data itself."""
+    
+    def get_etag_parts(self):
+        raise ImproperlyConfigured("'CachedResponseMixin' requires 'get_etag_parts' to be implemented")
+    
+    def get_last_modified(self):
+        # clients holding a Last-Modified date get a 304 without an ETag
+        # check, so it must change whenever any of the ETag parts does
+        return None
+    
+    def get_permission_scope(self):
+        # the only user dependent part of the pages is the staff admin link
+        return self.request.user.is_staff and 'staff' or 'user'
+    
+    def get_etag(self):
+        parts = list(self.get_etag_parts()) + [self.get_permission_scope()]
+        return md5_constructor(u'|'.join([unicode(part) for part in parts]).encode('utf-8')).hexdigest()
+    
+    def is_not_modified(self, etag, last_modified):
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            try:
+                return etag in parse_etags(if_none_match)
+            except ValueError:
+                return False
+        if_modified_since = self.request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since and last_modified is not None:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+            return if_modified_since is not None and last_modified <= if_modified_since
+        return False
+    
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        last_modified = self.get_last_modified()
+        if last_modified is not None:
+            # naive datetimes are in local time
+            last_modified = mktime(last_modified.timetuple())
+        if self.is_not_modified(etag, last_modified):
+            response = HttpResponseNotModified()
+        else:
+            cache_key = 'steering.views.%s.%s' % (self.__class__.__name__, etag)
+            cached = cache.get(cache_key)
+            if cached is None:
+                response = super(CachedResponseMixin, self).get(request, *args, **kwargs)
+                if hasattr(response, 'render'):
+                    response.render()
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(cache_key, (response.status_code, response.items(), response.content), REPORT_CACHE_TIMEOUT)
+            else:
+                status_code, headers, content = cached
+                response = HttpResponse(content, status=status_code)
+                # the headers include the Content-Type
+                for header, value in headers:
+                    response[header] = value
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+class ReportListView(PermissionRequiredMixin, CachedResponseMixin, ListView):
     permission_required = 'core.view_project'
     context_object_name = "reports_list"
     template_name = "steering/reports_list.html"
     
     def get_queryset(self, **kwargs):
-        return Report.objects.filter(project=Project.objects.get(slug=self.kwargs['project_slug'])).order_by('-date')
+        return Report.objects.filter(project=self.get_object()).defer(*SECTIONS).order_by('-date')
     
     def get_object(self, **kwargs):
-        object = Project.objects.get(slug=self.kwargs['project_slug'])
-        return object
+        return self.request.project_context.project
+    
+    def get_etag_parts(self):
+        project = self.get_object()
+        return [project.id, get_report_pages_version(project.id), self.request.GET.urlencode()]
 
     def get_context_data(self, **kwargs):
         context = super(ReportListView, self).get_context_data(**kwargs)
         context.update({
             'project': self.get_object(),
-            'last_report': Report.objects.filter(project=Project.objects.get(slug=self.kwargs['project_slug'])).order_by('-date')[0]
+            'last_report': Report.objects.filter(project=self.get_object()).defer(*SECTIONS).order_by('-date')[0]
         })
         return context
 
-class ReportDetailView(PermissionRequiredMixin, DetailView):
+class ReportDetailView(PermissionRequiredMixin, CachedResponseMixin, DetailView):
     permission_required = 'steering.view_report'
     context_object_name = "report"
     model = Report
     template_name = "steering/report_detail.html"
     
     def get_object(self, **kwargs):
-        object = Report.objects.get(id=self.kwargs['report_id'])
-        return object
+        if getattr(self, 'object', None) is None:
+            self.object = Report.objects.defer(*SECTIONS).select_related('project', 'current_iteration__counters').get(id=self.kwargs['report_id'])
+        return self.object
+    
+    def get_etag_parts(self):
+        report = self.get_object()
+        # the timetable of the page always includes today
+        return [report.id, get_report_pages_version(report.project_id), date.today()]
 
     def get_context_data(self, **kwargs):
         context = super(ReportDetailView, self).get_context_data(**kwargs)
         elements_list = []
         elements_list.append(self.object.current_iteration)
-        new_subjects = ast.literal_eval(self.object.new_subjects)
-        open_subjects = ast.literal_eval(self.object.open_subjects)
-        closed_solved_subjects = ast.literal_eval(self.object.closed_solved_subjects)
-        closed_unsolved_subjects = ast.literal_eval(self.object.closed_unsolved_subjects)
+        sections = get_report_sections(self.object)
+        new_subjects = sections['new_subjects']
+        open_subjects = sections['open_subjects']
+        closed_solved_subjects = sections['closed_solved_subjects']
+        closed_unsolved_subjects = sections['closed_unsolved_subjects']
         chart_table = []
         item_open = {}
         item_open.update({
@@ -70,7 +151,7 @@ class ReportDetailView(PermissionRequiredMixin, DetailView):
         })
         chart_table.append(item_closed_s)
         context.update({
-            'project': Project.objects.get(slug=self.kwargs['project_slug']),
+            'project': self.request.project_context.project,
             'elements_list': elements_list,
             'new_subjects': new_subjects,
             'open_subjects': open_subjects,
@@ -87,20 +168,98 @@ class IterationDetailView(PermissionRequiredMixin, DetailView):
     template_name = "steering/iteration_detail.html"
     
     def get_object(self, **kwargs):
-        object = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
-        return object
+        if getattr(self, 'object', None) is None:
+            self.object = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
+            states.attach([self.object])
+        return self.object
 
     def get_context_data(self, **kwargs):
         context = super(IterationDetailView, self).get_context_data(**kwargs)
         elements_list = []
         elements_list.append(self.object)
         context.update({
-            'subjects': self.object.subjects.all().order_by('state__rank'),
+            'subjects': states.attach(list(self.object.subjects.all().order_by('state__rank'))),
             'project': self.object.project,
             'elements_list': elements_list
         })
         return context
 
+class IterationMetricsView(PermissionRequiredMixin, View):
+    permission_required = 'steering.view_iteration'
+
+    def get_object(self, **kwargs):
+        if getattr(self, 'object', None) is None:
+            self.object = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
+        return self.object
+
+    def get(self, request, *args, **kwargs):
+        metrics = IterationMetrics.objects.filter(iteration=self.get_object())
+        try:
+            if 'from' in request.GET:
+                metrics = metrics.filter(date__gte=datetime.strptime(request.GET['from'], '%Y-%m-%d').date())
+            if 'to' in request.GET:
+                metrics = metrics.filter(date__lte=datetime.strptime(request.GET['to'], '%Y-%m-%d').date())
+        except ValueError:
+            return HttpResponseBadRequest("'from' and 'to' must be YYYY-MM-DD dates")
+        data = []
+        for row in metrics.values_list('date', 'new_subjects', 'open_subjects', 'closed_solved_subjects', 'closed_unsolved_subjects', 'new_replies', 'total_replies'):
+            data.append({
+                'date': row[0].strftime('%Y-%m-%d'),
+                'new': row[1],
+                'open': row[2],
+                'solved': row[3],
+                'unsolved': row[4],
+                'total': row[2] + row[3] + row[4],
+                'new_replies': row[5],
+                'replies': row[6]
+            })
+        return HttpResponse(json.dumps(data), mimetype='application/json')
+
+class ProjectTimetableView(PermissionRequiredMixin, View):
+    """Timetable data of the project's iterations as JSON, for pages loading
+    the Gantt lazily instead of rendering {% timetable %} inline."""
+    permission_required = 'core.view_project'
+
+    def get_object(self, **kwargs):
+        return self.request.project_context.project
+
+    def get_events(self):
+        return self.get_object().iterations.order_by('rank')
+
+    def get(self, request, *args, **kwargs):
+        data = timetable_to_json(get_timetable(list(self.get_events())))
+        return HttpResponse(json.dumps(data), mimetype='application/json')
+
+class ProjectTimetableSvgView(ProjectTimetableView):
+    """The project's timetable as an SVG image, cached on disk, for pages and
+    emails embedding it instead of the {% timetable %} table."""
+
+    def get(self, request, *args, **kwargs):
+        timetable = get_timetable(list(self.get_events()))
+        etag = get_timetable_svg_digest(timetable)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            f = open(get_timetable_svg(self.get_object().id, timetable), 'rb')
+            try:
+                response = HttpResponse(f.read(), mimetype='image/svg+xml')
+            finally:
+                f.close()
+        response['ETag'] = quote_etag(etag)
+        return response
+
+class IterationTimetableView(ProjectTimetableView):
+    permission_required = 'steering.view_iteration'
+
+    def get_object(self, **kwargs):
+        if getattr(self, 'object', None) is None:
+            self.object = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
+        return self.object
+
+    def get_events(self):
+        return [self.get_object()]
+
 class SubjectCreateView(PermissionRequiredMixin, CreateView):
     permission_required = 'steering.view_iteration'
     model = Subject
@@ -109,8 +268,10 @@ class SubjectCreateView(PermissionRequiredMixin, CreateView):
     tags = []
 
     def get_object(self, **kwargs):
-        object = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
-        return object
+        # the iteration, self.object being the created subject
+        if getattr(self, 'iteration', None) is None:
+            self.iteration = Iteration.objects.get(slug=self.kwargs['iteration_slug'])
+        return self.iteration
 
     def post(self, request, *args, **kwargs):
         tags_str = self.request.POST['tags']
@@ -118,10 +279,12 @@ class SubjectCreateView(PermissionRequiredMixin, CreateView):
         for t in tags_list:
             self.tags.append(t)
         subject = Subject(name=request.POST['name'], content=request.POST['content'])
-        project = Project.objects.get(slug=self.kwargs['project_slug'])
-        subject.author=ProjectActor.objects.get(user=self.request.user, project=project)
-        subject.iteration=Iteration.objects.get(slug=self.kwargs['iteration_slug'])
-        subject.state=State.objects.get(name='Open')
+        project = self.request.project_context.project
+        subject.author=self.request.project_context.actor
+        if subject.author is None:
+            return HttpResponseForbidden()
+        subject.iteration=self.get_object()
+        subject.state=states.get('Open')
         subject.save()
         for tag in self.tags:
             if tag != '' and tag != ' ' and tag != '  ':
@@ -137,9 +300,9 @@ class SubjectCreateView(PermissionRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super(SubjectCreateView, self).get_context_data(**kwargs)
         context.update({
-            'iteration': Iteration.objects.get(slug=self.kwargs['iteration_slug']),
-            'project': Project.objects.get(slug=self.kwargs['project_slug']),
-            'tags_already_used': Tag.objects.filter(subject__iteration__project=Project.objects.get(slug=self.kwargs['project_slug'])).order_by('?')[:10]
+            'iteration': self.get_object(),
+            'project': self.request.project_context.project,
+            'tags_already_used': Tag.objects.filter(subject__iteration__project=self.request.project_context.project).order_by('?')[:10]
         })
         return context
 
@@ -150,8 +313,10 @@ class SubjectDetailView(PermissionRequiredMixin, DetailView):
     template_name = "steering/subject_detail.html"
 
     def get_object(self, **kwargs):
-        object = Subject.objects.get(id=self.kwargs['subject_id'])
-        return object
+        if getattr(self, 'object', None) is None:
+            self.object = Subject.objects.get(id=self.kwargs['subject_id'])
+            states.attach([self.object])
+        return self.object
 
     def get_context_data(self, **kwargs):
         context = super(SubjectDetailView, self).get_context_data(**kwargs)
@@ -170,14 +335,18 @@ class ReplyCreateView(PermissionRequiredMixin, CreateView):
     template_name = "steering/subject_detail.html"
 
     def get_object(self, **kwargs):
-        object = Subject.objects.get(id=self.kwargs['subject_id'])
-        return object
+        # the subject, self.object being the created reply
+        if getattr(self, 'subject', None) is None:
+            self.subject = Subject.objects.get(id=self.kwargs['subject_id'])
+        return self.subject
 
     def post(self, request, *args, **kwargs):
         reply = Reply(title=request.POST['title'], content=request.POST['content'])
-        project = Project.objects.get(slug=self.kwargs['project_slug'])
-        reply.author=ProjectActor.objects.get(user=self.request.user, project=project)
-        reply.subject=Subject.objects.get(id=self.kwargs['subject_id'])
+        project = self.request.project_context.project
+        reply.author=self.request.project_context.actor
+        if reply.author is None:
+            return HttpResponseForbidden()
+        reply.subject=self.get_object()
         reply.save()
         if "thirdparty.notification" in settings.INSTALLED_APPS:
             from thirdparty.notification import models as notification
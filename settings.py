@@ -107,6 +107,7 @@ TEMPLATE_CONTEXT_PROCESSORS = (
     'django.core.context_processors.media',
     'django.core.context_processors.request',
     'django.core.context_processors.static',
+    'app.frontend.context_processors.project_context',
 )
 
 MIDDLEWARE_CLASSES = (
@@ -114,6 +115,8 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'thirdparty.guardian.middleware.ObjectPermissionCheckerMiddleware',
+    'app.frontend.middleware.ProjectContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'thirdparty.pagination.middleware.PaginationMiddleware',
     'thirdparty.django_sorting.middleware.SortingMiddleware',
@@ -1,9 +1,7 @@
-from django.contrib.auth.models import User
 from django.db import models
 
-from guardian.conf import settings
 from guardian.exceptions import WrongAppError
-from guardian.core import ObjectPermissionChecker
+from guardian.core import get_checker
 
 class ObjectPermissionBackend(object):
     supports_object_permissions = True
@@ -40,10 +38,12 @@ class ObjectPermissionBackend(object):
         if not isinstance(obj, models.Model):
             return False
 
-        # This is how we support anonymous users - simply try to retrieve User
-        # instance and perform checks for that predefined user
-        if not user_obj.is_authenticated():
-            user_obj = User.objects.get(pk=settings.ANONYMOUS_USER_ID)
+        # Checker is shared by all checks of a request if
+        # ObjectPermissionCheckerMiddleware is installed. This is also how we
+        # support anonymous users - checker retrieves predefined User instance
+        # and performs checks for that user
+        check = get_checker(user_obj)
+        user_obj = check.user
 
         # Do not check any further if user is not active
         if user_obj.is_active is not True:
@@ -55,6 +55,5 @@ class ObjectPermissionBackend(object):
                 raise WrongAppError("Passed perm has app label of '%s' and "
                     "given obj has '%s'" % (app_label, obj._meta.app_label))
 
-        check = ObjectPermissionChecker(user_obj)
         return check.has_perm(perm, obj)
 
@@ -0,0 +1,60 @@
+"""
+Cross-request cache of object permissions, enabled with
+``GUARDIAN_CACHE_PERMISSIONS`` setting.
+
+Permissions are stored by ``ObjectPermissionChecker`` within Django's cache
+as one ``{object_pk: [codename, ...]}`` dictionary per user (or group) and
+content type. Every key contains a global version which is bumped whenever
+object permissions or group membership change, so outdated entries are
+simply never read again and expire after ``GUARDIAN_CACHE_TIMEOUT`` seconds.
+
+.. note::
+   Cache has to be shared by all processes (i.e. memcached or filesystem
+   backend) for changes made by one process to be seen by the others.
+"""
+import time
+
+from django.core.cache import cache
+
+from guardian.conf import settings as guardian_settings
+
+VERSION_KEY = 'guardian.perms.version'
+VERSION_TIMEOUT = 30 * 24 * 3600
+
+def get_version():
+    """
+    Returns current version of cached permissions.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from a time based value so that entries cached before the
+        # version key got evicted are not read again
+        version = int(time.time() * 1000)
+        cache.add(VERSION_KEY, version, VERSION_TIMEOUT)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+def bump_version(**kwargs):
+    """
+    Invalidates all cached permissions. Connected to signals of object
+    permissions and group membership changes.
+    """
+    if not guardian_settings.CACHE_PERMISSIONS:
+        return
+    if kwargs.get('action') in ('pre_add', 'pre_remove', 'pre_clear'):
+        return
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+
+def get_cache_key(version, user, group, ctype):
+    """
+    Returns cache key of permissions of ``user`` or ``group`` for objects of
+    ``ctype`` content type.
+    """
+    if user:
+        identity = 'user.%s' % user.pk
+    else:
+        identity = 'group.%s' % group.pk
+    return 'guardian.perms.%s.%s.%s' % (version, identity, ctype.id)
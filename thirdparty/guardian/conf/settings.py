@@ -10,6 +10,9 @@ if ANONYMOUS_USER_ID is None:
 RENDER_403 = getattr(settings, 'GUARDIAN_RENDER_403', False)
 TEMPLATE_403 = getattr(settings, 'GUARDIAN_TEMPLATE_403', '403.html')
 RAISE_403 = getattr(settings, 'GUARDIAN_RAISE_403', False)
+CACHE_PERMISSIONS = getattr(settings, 'GUARDIAN_CACHE_PERMISSIONS', False)
+CACHE_TIMEOUT = getattr(settings, 'GUARDIAN_CACHE_TIMEOUT', 3600)
+INTEGER_OBJECT_PKS = getattr(settings, 'GUARDIAN_INTEGER_OBJECT_PKS', False)
 
 def check_configuration():
     if RENDER_403 and RAISE_403:
@@ -2,9 +2,33 @@ from itertools import chain
 
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q, F
+from django.core.cache import cache
+from django.db import connections
+from django.utils.encoding import force_unicode
 
-from guardian.utils import get_identity
+from guardian.cache import get_cache_key, get_version
+from guardian.conf import settings as guardian_settings
+from guardian.models import UserObjectPermission, GroupObjectPermission
+from guardian.utils import get_identity, get_object_pk_field
+
+# number of objects whose permissions are fetched by a single query, keeps
+# the query below database limits of bound parameters
+PREFETCH_CHUNK_SIZE = 500
+
+# attribute of the ``User``/``AnonymousUser`` instances holding the checker
+# shared by all the checks of a request, see
+# ``guardian.middleware.ObjectPermissionCheckerMiddleware``
+CHECKER_ATTR = '_obj_perms_checker'
+
+def get_checker(user_or_group):
+    """
+    Returns ``ObjectPermissionChecker`` attached to given ``user_or_group`` by
+    ``ObjectPermissionCheckerMiddleware`` or a new one if there is none.
+    """
+    checker = getattr(user_or_group, CHECKER_ATTR, None)
+    if checker is None:
+        checker = ObjectPermissionChecker(user_or_group)
+    return checker
 
 class ObjectPermissionChecker(object):
     """
@@ -23,6 +47,10 @@ class ObjectPermissionChecker(object):
        perm1/object1 on same instance of ObjectPermissionChecker we won't see a
        difference as permissions are already fetched and stored within cache
        dictionary.
+
+       If ``GUARDIAN_CACHE_PERMISSIONS`` is set, fetched permissions are also
+       stored within Django's cache and reused by other checkers until object
+       permissions or group membership change (see ``guardian.cache``).
     """
     def __init__(self, user_or_group=None):
         """
@@ -31,6 +59,8 @@ class ObjectPermissionChecker(object):
         """
         self.user, self.group = get_identity(user_or_group)
         self._obj_perms_cache = {}
+        self._shared_perms_cache = {}
+        self._cache_version = None
 
     def has_perm(self, perm, obj):
         """
@@ -64,28 +94,129 @@ class ObjectPermissionChecker(object):
                 perms = list(chain(*Permission.objects
                     .filter(content_type=ctype)
                     .values_list("codename")))
-            elif self.user:
-                perms = list(set(chain(*Permission.objects
-                    .filter(content_type=ctype)
-                    .filter(
-                        Q(userobjectpermission__content_type=F('content_type'),
-                            userobjectpermission__user=self.user,
-                            userobjectpermission__object_pk=obj.pk) |
-                        Q(groupobjectpermission__content_type=F('content_type'),
-                            groupobjectpermission__group__user=self.user,
-                            groupobjectpermission__object_pk=obj.pk))
-                    .values_list("codename"))))
             else:
-                perms = list(set(chain(*Permission.objects
-                    .filter(content_type=ctype)
-                    .filter(
-                        groupobjectpermission__content_type=F('content_type'),
-                        groupobjectpermission__group=self.group,
-                        groupobjectpermission__object_pk=obj.pk)
-                    .values_list("codename"))))
+                object_pk = force_unicode(obj.pk)
+                shared_perms = self.get_shared_perms(ctype)
+                if object_pk in shared_perms:
+                    perms = shared_perms[object_pk]
+                else:
+                    perms = self.fetch_perms(ctype, obj)
+                    self.store_shared_perms(ctype, {object_pk: perms})
             self._obj_perms_cache[key] = perms
         return self._obj_perms_cache[key]
 
+    def fetch_perms(self, ctype, obj):
+        """
+        Returns list of ``codename``'s of permissions for given ``obj``
+        retrieved from the database.
+        """
+        object_pk = {get_object_pk_field(obj.__class__): obj.pk}
+        return list(set(chain(*union_all([queryset
+            .values_list('permission__codename').order_by()
+            for queryset in self.get_obj_perms_querysets(ctype, object_pk)]))))
+
+    def get_obj_perms_querysets(self, ctype, object_pks):
+        """
+        Returns querysets of user and group object permissions for objects of
+        ``ctype`` content type matching ``object_pks`` lookup. Object
+        permissions tables are queried directly, so that
+        ``(content_type, object_id, user/group)`` indexes are used.
+        """
+        group_perms = GroupObjectPermission.objects.filter(
+            permission__content_type=ctype, content_type=ctype, **object_pks)
+        if self.user:
+            user_perms = UserObjectPermission.objects.filter(
+                permission__content_type=ctype, content_type=ctype,
+                user=self.user, **object_pks)
+            return [user_perms, group_perms.filter(group__user=self.user)]
+        return [group_perms.filter(group=self.group)]
+
+    def get_shared_perms(self, ctype):
+        """
+        Returns ``{object_pk: codenames}`` dictionary of permissions for
+        objects of ``ctype`` stored within Django's cache (empty if
+        ``GUARDIAN_CACHE_PERMISSIONS`` is not set). Retrieved once per checker
+        and content type.
+        """
+        if not guardian_settings.CACHE_PERMISSIONS:
+            return {}
+        if ctype.id not in self._shared_perms_cache:
+            if self._cache_version is None:
+                self._cache_version = get_version()
+            self._shared_perms_cache[ctype.id] = cache.get(get_cache_key(
+                self._cache_version, self.user, self.group, ctype)) or {}
+        return self._shared_perms_cache[ctype.id]
+
+    def store_shared_perms(self, ctype, perms):
+        """
+        Adds ``perms`` (``{object_pk: codenames}`` dictionary) to permissions
+        of ``ctype`` objects stored within Django's cache.
+        """
+        if not guardian_settings.CACHE_PERMISSIONS or not perms:
+            return
+        shared_perms = self.get_shared_perms(ctype)
+        shared_perms.update(perms)
+        cache.set(get_cache_key(self._cache_version, self.user, self.group,
+            ctype), shared_perms, guardian_settings.CACHE_TIMEOUT)
+
+    def prefetch_perms(self, objects):
+        """
+        Fetches permissions of all given ``objects`` at once and stores them
+        within the cache, so following ``has_perm``/``get_perms`` calls for
+        those objects don't hit the database. User and group permissions are
+        retrieved with a single query (per ``PREFETCH_CHUNK_SIZE`` objects).
+
+        Call it before checking permissions of each object of a list, e.g.
+        with ``get_checker(request.user).prefetch_perms(object_list)``. Only
+        the checks answered from the objects' own permissions use it: a
+        permission granted through another object, such as a project, is
+        checked on that object.
+
+        :param objects: list of Django model instances of the same model
+
+        """
+        objects = [obj for obj in objects
+            if self.get_local_cache_key(obj) not in self._obj_perms_cache]
+        if not objects:
+            return
+        ctype = ContentType.objects.get_for_model(objects[0])
+        if self.user and not self.user.is_active:
+            return
+        elif self.user and self.user.is_superuser:
+            perms = list(chain(*Permission.objects
+                .filter(content_type=ctype)
+                .values_list("codename")))
+            for obj in objects:
+                self._obj_perms_cache[self.get_local_cache_key(obj)] = perms
+            return
+        shared_perms = self.get_shared_perms(ctype)
+        missing = []
+        for obj in objects:
+            object_pk = force_unicode(obj.pk)
+            if object_pk in shared_perms:
+                self._obj_perms_cache[self.get_local_cache_key(obj)] = \
+                    shared_perms[object_pk]
+            else:
+                missing.append(obj)
+        objects = missing
+        fetched_perms = {}
+        object_pk_in = get_object_pk_field(ctype.model_class()) + '__in'
+        for i in xrange(0, len(objects), PREFETCH_CHUNK_SIZE):
+            chunk = objects[i:i + PREFETCH_CHUNK_SIZE]
+            pks = [force_unicode(obj.pk) for obj in chunk]
+            querysets = self.get_obj_perms_querysets(ctype,
+                {object_pk_in: [obj.pk for obj in chunk]})
+            obj_perms = dict((pk, set()) for pk in pks)
+            for object_pk, codename in union_all([queryset
+                    .values_list('object_pk', 'permission__codename')
+                    .order_by() for queryset in querysets]):
+                obj_perms[object_pk].add(codename)
+            for pk, obj in zip(pks, chunk):
+                fetched_perms[pk] = list(obj_perms[pk])
+                self._obj_perms_cache[self.get_local_cache_key(obj)] = \
+                    fetched_perms[pk]
+        self.store_shared_perms(ctype, fetched_perms)
+
     def get_local_cache_key(self, obj):
         """
         Returns cache key for ``_obj_perms_cache`` dict.
@@ -93,3 +224,17 @@ class ObjectPermissionChecker(object):
         ctype = ContentType.objects.get_for_model(obj)
         return (ctype.id, obj.pk)
 
+
+def union_all(querysets):
+    """
+    Returns rows of all given ``values_list`` querysets, retrieved with a
+    single ``UNION ALL`` query.
+    """
+    sql, params = [], []
+    for queryset in querysets:
+        query_sql, query_params = queryset.query.get_compiler(queryset.db).as_sql()
+        sql.append(query_sql)
+        params.extend(query_params)
+    cursor = connections[querysets[0].db].cursor()
+    cursor.execute(' UNION ALL '.join(sql), params)
+    return cursor.fetchall()
@@ -0,0 +1,98 @@
+import time
+from optparse import make_option
+
+from django.contrib.auth.models import User, Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connection, transaction, DatabaseError
+
+from guardian.models import UserObjectPermission, GroupObjectPermission
+from guardian.shortcuts import filter_objects_in_sql, filter_objects_in_python
+
+
+@transaction.commit_on_success
+def create_objects(count):
+    """
+    Creates ``count`` groups (used as objects to check) and a user who has
+    ``change_group`` for all of them and ``delete_group`` for every other
+    one. Half of those permissions are given through user's group.
+    """
+    user = User.objects.create(username='benchmark')
+    users_group = Group.objects.create(name='benchmark')
+    user.groups.add(users_group)
+    ctype = ContentType.objects.get_for_model(Group)
+    change = Permission.objects.get(content_type=ctype, codename='change_group')
+    delete = Permission.objects.get(content_type=ctype, codename='delete_group')
+    for i in xrange(count):
+        group = Group.objects.create(name='benchmark %d' % i)
+        perms = [change]
+        if i % 2:
+            perms.append(delete)
+        for perm in perms:
+            if i % 4 < 2:
+                UserObjectPermission(user=user, permission=perm,
+                    content_type=ctype, object_pk=group.pk).save()
+            else:
+                GroupObjectPermission(group=users_group, permission=perm,
+                    content_type=ctype, object_pk=group.pk).save()
+    return user, ctype
+
+
+class Command(NoArgsCommand):
+    """
+    Compares SQL and Python filtering of
+    :func:`guardian.shortcuts.get_objects_for_user` on an in-memory SQLite
+    database.
+
+    Usage::
+
+        $ python manage.py benchmark_get_objects_for_user --objects=5000
+        5000 objects, change_group: sql 0.0251s (2500 found), python 0.0973s (2500 found)
+        ...
+
+    """
+    help = "Compares SQL and Python filtering of get_objects_for_user"
+    option_list = NoArgsCommand.option_list + (
+        make_option('--objects', action='store', dest='objects', type='int',
+            default=1000, help='Number of objects to check.'),
+        make_option('--repeat', action='store', dest='repeat', type='int',
+            default=5, help='Number of timed runs, best one is reported.'),
+    )
+
+    def handle_noargs(self, **options):
+        if connection.settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("Benchmark runs on an in-memory SQLite "
+                "database, default database must use sqlite3 backend")
+        old_name = connection.settings_dict['NAME']
+        old_test_name = connection.settings_dict.get('TEST_NAME')
+        connection.settings_dict['TEST_NAME'] = ':memory:'
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(int(options['objects']), max(int(options['repeat']), 1))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict['TEST_NAME'] = old_test_name
+
+    def run(self, count, repeat):
+        user, ctype = create_objects(count)
+        queryset = Group.objects.exclude(name='benchmark')
+        for codenames in (set(['change_group']),
+                set(['change_group', 'delete_group'])):
+            results = []
+            for name, func in (('sql', filter_objects_in_sql),
+                    ('python', filter_objects_in_python)):
+                best = None
+                try:
+                    for i in xrange(repeat):
+                        start = time.time()
+                        found = len(list(func(queryset, user, ctype, codenames)
+                            .values_list('pk', flat=True)))
+                        elapsed = time.time() - start
+                        if best is None or elapsed < best:
+                            best = elapsed
+                    results.append("%s %.4fs (%d found)" % (name, best, found))
+                except DatabaseError, e:
+                    transaction.rollback_unless_managed()
+                    results.append("%s failed (%s)" % (name, e))
+            print "%d objects, %s: %s" % (count, ', '.join(sorted(codenames)),
+                ', '.join(results))
@@ -1,3 +1,5 @@
+from optparse import make_option
+
 from django.core.management.base import NoArgsCommand
 
 from guardian.utils import clean_orphan_obj_perms
@@ -13,12 +15,33 @@ class Command(NoArgsCommand):
         $ python manage.py clean_orphan_obj_perms
         Removed 11 object permission entries with no targets
 
+    With ``--dry-run`` orphans are only counted. Progress is reported per
+    content type with ``--verbosity=2``::
+
+        $ python manage.py clean_orphan_obj_perms --dry-run --verbosity=2
+        auth.group (UserObjectPermission): 11 orphan object permissions for 4 of 120 objects
+        Found 11 object permission entries with no targets
+
     """
     help = "Removes object permissions with not existing targets"
+    option_list = NoArgsCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run',
+            default=False, help='Only count object permissions with not '
+            'existing targets, do not remove them.'),
+    )
 
     def handle_noargs(self, **options):
-        removed = clean_orphan_obj_perms()
-        if options['verbosity'] > 0:
-            print "Removed %d object permission entries with no targets" %\
-                removed
-
+        verbosity = int(options.get('verbosity', 1))
+        progress = None
+        if verbosity > 1:
+            def progress(message):
+                print message
+        dry_run = options.get('dry_run', False)
+        removed = clean_orphan_obj_perms(dry_run=dry_run, progress=progress)
+        if verbosity > 0:
+            if dry_run:
+                print "Found %d object permission entries with no targets" %\
+                    removed
+            else:
+                print "Removed %d object permission entries with no targets" %\
+                    removed
@@ -1,10 +1,113 @@
-from django.db import models
+from django.db import connections, models, transaction
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 
+from guardian.cache import bump_version
 from guardian.exceptions import ObjectNotPersisted
+from guardian.utils import get_integer_pk
 
-class UserObjectPermissionManager(models.Manager):
+# rows inserted (or object pks deleted) per query. SQLite refuses statements
+# with more than 999 bound parameters and each inserted row binds 5 of them
+# (identity, permission, content type, object_pk and object_id), so 150 rows
+# (750 parameters) stay under the limit where 200 (1000) would not
+BULK_BATCH_SIZE = 150
+
+class BaseObjectPermissionManager(models.Manager):
+    """
+    Bulk operations shared by user and group object permission managers.
+    Subclasses set ``identity_field`` to the name of their ``ForeignKey`` to
+    ``User`` or ``Group``.
+    """
+    identity_field = None
+
+    def bulk_assign(self, perm, identity, queryset):
+        """
+        Assigns permission ``perm`` for all objects of ``queryset`` to
+        ``identity`` (user or group). Permission is resolved once, already
+        assigned objects are skipped with a single query and missing rows are
+        inserted with multi-row ``INSERT``s within one transaction. Returns
+        number of created rows.
+
+        .. note::
+           Rows are inserted with raw SQL, ``post_save`` signal is not sent.
+           Cached permissions are invalidated all the same.
+        """
+        ctype = ContentType.objects.get_for_model(queryset.model)
+        permission = Permission.objects.get(
+            content_type=ctype, codename=perm)
+        existing = set(self.filter(**{
+            self.identity_field: identity,
+            'permission': permission,
+            'content_type': ctype,
+        }).values_list('object_pk', flat=True))
+        object_pks = [unicode(pk) for pk in queryset.values_list('pk',
+            flat=True).order_by()]
+        object_pks = [pk for pk in object_pks if pk not in existing]
+        if not object_pks:
+            return 0
+        opts = self.model._meta
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        columns = [opts.get_field(name).column for name in
+            (self.identity_field, 'permission', 'content_type', 'object_pk',
+            'object_id')]
+        sql = 'INSERT INTO %s (%s) VALUES ' % (qn(opts.db_table),
+            ', '.join([qn(column) for column in columns]))
+        with transaction.commit_on_success(using=self.db):
+            cursor = connection.cursor()
+            for i in xrange(0, len(object_pks), BULK_BATCH_SIZE):
+                batch = object_pks[i:i + BULK_BATCH_SIZE]
+                params = []
+                for pk in batch:
+                    params.extend([identity.pk, permission.pk, ctype.pk, pk,
+                        get_integer_pk(pk)])
+                cursor.execute(sql + ', '.join(['(%s, %s, %s, %s, %s)'] *
+                    len(batch)), params)
+            transaction.set_dirty(using=self.db)
+        # raw INSERTs do not send the signals invalidating cached permissions
+        bump_version()
+        return len(object_pks)
+
+    def bulk_remove_perm(self, perm, identity, queryset):
+        """
+        Removes permission ``perm`` for all objects of ``queryset`` from
+        ``identity`` (user or group), with batched ``DELETE``s within one
+        transaction. Returns number of deleted rows.
+
+        .. note::
+           Rows are deleted with raw SQL, ``post_delete`` signal is not sent.
+           Cached permissions are invalidated all the same.
+        """
+        ctype = ContentType.objects.get_for_model(queryset.model)
+        permission = Permission.objects.get(
+            content_type=ctype, codename=perm)
+        object_pks = [unicode(pk) for pk in queryset.values_list('pk',
+            flat=True).order_by()]
+        opts = self.model._meta
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        sql = 'DELETE FROM %s WHERE %s = %%s AND %s = %%s AND %s = %%s AND %s IN ' % (
+            qn(opts.db_table),
+            qn(opts.get_field(self.identity_field).column),
+            qn(opts.get_field('permission').column),
+            qn(opts.get_field('content_type').column),
+            qn(opts.get_field('object_pk').column))
+        deleted = 0
+        with transaction.commit_on_success(using=self.db):
+            cursor = connection.cursor()
+            for i in xrange(0, len(object_pks), BULK_BATCH_SIZE):
+                batch = object_pks[i:i + BULK_BATCH_SIZE]
+                cursor.execute(sql + '(%s)' % ', '.join(['%s'] * len(batch)),
+                    [identity.pk, permission.pk, ctype.pk] + batch)
+                deleted += cursor.rowcount
+            transaction.set_dirty(using=self.db)
+        if deleted:
+            # nor do raw DELETEs
+            bump_version()
+        return deleted
+
+class UserObjectPermissionManager(BaseObjectPermissionManager):
+    identity_field = 'user'
 
     def assign(self, perm, user, obj):
         """
@@ -50,7 +153,8 @@ class UserObjectPermissionManager(models.Manager):
         )
         return perms
 
-class GroupObjectPermissionManager(models.Manager):
+class GroupObjectPermissionManager(BaseObjectPermissionManager):
+    identity_field = 'group'
 
     def assign(self, perm, group, obj):
         """
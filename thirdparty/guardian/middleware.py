@@ -0,0 +1,29 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import SimpleLazyObject
+
+from guardian.core import CHECKER_ATTR, ObjectPermissionChecker
+
+class ObjectPermissionCheckerMiddleware(object):
+    """
+    Attaches a single ``ObjectPermissionChecker`` to ``request.user`` so that
+    ``ObjectPermissionBackend`` and ``get_obj_perms`` template tag reuse its
+    cache for the whole request - every object is then checked against
+    database only once per request.
+
+    Must be placed after
+    ``django.contrib.auth.middleware.AuthenticationMiddleware``.
+
+    .. note::
+       As with any ``ObjectPermissionChecker``, permissions changed during
+       the request are not seen by checks made for the same object earlier
+       in that request.
+    """
+    def process_request(self, request):
+        if not hasattr(request, 'user'):
+            raise ImproperlyConfigured("ObjectPermissionCheckerMiddleware "
+                "requires AuthenticationMiddleware to be installed before it")
+        user = request.user
+        # checker is only created (and anonymous user only fetched) on first
+        # check
+        setattr(user, CHECKER_ATTR,
+            SimpleLazyObject(lambda: ObjectPermissionChecker(user)))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
@@ -7,7 +8,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from guardian.managers import UserObjectPermissionManager
 from guardian.managers import GroupObjectPermissionManager
-from guardian.utils import get_anonymous_user
+from guardian.cache import bump_version
+from guardian.utils import get_anonymous_user, get_integer_pk
 
 class BaseObjectPermission(models.Model):
     """
@@ -17,6 +19,10 @@ class BaseObjectPermission(models.Model):
 
     content_type = models.ForeignKey(ContentType)
     object_pk = models.CharField(_('object ID'), max_length=255)
+    # integer copy of ``object_pk``, compared instead of it for models with
+    # integer primary keys if ``GUARDIAN_INTEGER_OBJECT_PKS`` is set
+    object_id = models.IntegerField(_('object integer ID'), null=True,
+        blank=True, editable=False)
     content_object = generic.GenericForeignKey(fk_field='object_pk')
 
     class Meta:
@@ -33,6 +39,7 @@ class BaseObjectPermission(models.Model):
             raise ValidationError("Cannot persist permission not designed for "
                 "this class (permission's type is %s and object's type is %s)"
                 % (self.permission.content_type, self.content_type))
+        self.object_id = get_integer_pk(self.object_pk)
         return super(BaseObjectPermission, self).save(*args, **kwargs)
 
 class UserObjectPermission(BaseObjectPermission):
@@ -46,6 +53,9 @@ class UserObjectPermission(BaseObjectPermission):
     class Meta:
         unique_together = ['user', 'permission', 'content_type', 'object_pk']
 
+post_save.connect(bump_version, sender=UserObjectPermission)
+post_delete.connect(bump_version, sender=UserObjectPermission)
+
 class GroupObjectPermission(BaseObjectPermission):
     """
     **Manager**: :manager:`GroupObjectPermissionManager`
@@ -57,6 +67,10 @@ class GroupObjectPermission(BaseObjectPermission):
     class Meta:
         unique_together = ['group', 'permission', 'content_type', 'object_pk']
 
+post_save.connect(bump_version, sender=GroupObjectPermission)
+post_delete.connect(bump_version, sender=GroupObjectPermission)
+m2m_changed.connect(bump_version, sender=User.groups.through)
+
 
 # Prototype User and Group methods
 setattr(User, 'get_anonymous', staticmethod(lambda: get_anonymous_user()))
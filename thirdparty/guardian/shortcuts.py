@@ -3,14 +3,14 @@ Convenient shortcuts to manage or check object permissions.
 """
 from django.contrib.auth.models import Permission, User, Group
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import connections, models
 from django.db.models import Q
 from django.shortcuts import _get_queryset
 from guardian.core import ObjectPermissionChecker
 from guardian.exceptions import MixedContentTypeError
 from guardian.exceptions import WrongAppError
 from guardian.models import UserObjectPermission, GroupObjectPermission
-from guardian.utils import get_identity
+from guardian.utils import get_identity, get_object_pk_field, uses_integer_pks
 from itertools import groupby
 
 def assign(perm, user_or_group, obj=None):
@@ -119,6 +119,51 @@ def remove_perm(perm, user_or_group=None, obj=None):
     if group:
         GroupObjectPermission.objects.remove_perm(perm, group, obj)
 
+def bulk_assign(perm, user_or_group, queryset):
+    """
+    Assigns permission to user/group for all objects of given ``queryset`` at
+    once. Returns number of newly created object permissions.
+
+    :param perm: proper permission for objects of ``queryset``, as string (in
+      format: ``app_label.codename`` or ``codename``)
+
+    :param user_or_group: instance of ``User``, ``AnonymousUser`` or ``Group``
+
+    :param queryset: ``QuerySet`` (or Model/Manager) of persisted objects
+
+    Example::
+
+        >>> group = Group.objects.get(name='project')
+        >>> bulk_assign('view_subject', group, Subject.objects.filter(
+        ...     iteration__project=project))
+        1024
+
+    """
+    user, group = get_identity(user_or_group)
+    perm = perm.split('.')[-1]
+    queryset = _get_queryset(queryset)
+    if user:
+        return UserObjectPermission.objects.bulk_assign(perm, user, queryset)
+    if group:
+        return GroupObjectPermission.objects.bulk_assign(perm, group, queryset)
+
+def bulk_remove_perm(perm, user_or_group, queryset):
+    """
+    Removes permission from user/group for all objects of given ``queryset``
+    at once. Returns number of deleted object permissions.
+
+    Parameters are the same as for :func:`bulk_assign`.
+    """
+    user, group = get_identity(user_or_group)
+    perm = perm.split('.')[-1]
+    queryset = _get_queryset(queryset)
+    if user:
+        return UserObjectPermission.objects.bulk_remove_perm(perm, user,
+            queryset)
+    if group:
+        return GroupObjectPermission.objects.bulk_remove_perm(perm, group,
+            queryset)
+
 def get_perms(user_or_group, obj):
     """
     Returns permissions for given user/group and object pair, as list of
@@ -338,6 +383,59 @@ def get_objects_for_user(user, perms, klass=None, use_groups=True):
     if user.is_superuser:
         return queryset
 
+    if can_filter_in_sql(queryset):
+        return filter_objects_in_sql(queryset, user, ctype, codenames,
+            use_groups)
+    return filter_objects_in_python(queryset, user, ctype, codenames,
+        use_groups)
+
+def can_filter_in_sql(queryset):
+    """
+    Returns ``True`` if ``queryset`` primary keys may be compared directly with
+    ``object_pk`` (a ``varchar`` column) of object permissions. SQLite and
+    MySQL convert the values on their own, other databases only accept it for
+    text primary keys - or integer ones compared with ``object_id`` if
+    ``GUARDIAN_INTEGER_OBJECT_PKS`` is set.
+    """
+    if uses_integer_pks(queryset.model):
+        return True
+    if queryset.model._meta.pk.get_internal_type() in ('CharField',
+            'TextField', 'SlugField'):
+        return True
+    return connections[queryset.db].vendor in ('sqlite', 'mysql')
+
+def filter_objects_in_sql(queryset, user, ctype, codenames, use_groups=True):
+    """
+    Returns ``queryset`` filtered by a subquery per codename, so the
+    database only returns objects for which ``user`` has all ``codenames``
+    (either directly or through his groups).
+    """
+    if not codenames:
+        return queryset.none()
+    object_pk_field = get_object_pk_field(queryset.model)
+    for codename in codenames:
+        user_obj_perms = UserObjectPermission.objects\
+            .filter(user=user)\
+            .filter(permission__content_type=ctype)\
+            .filter(permission__codename=codename)\
+            .values(object_pk_field)
+        q = Q(pk__in=user_obj_perms)
+        if use_groups:
+            groups_obj_perms = GroupObjectPermission.objects\
+                .filter(group__user=user)\
+                .filter(permission__content_type=ctype)\
+                .filter(permission__codename=codename)\
+                .values(object_pk_field)
+            q = q | Q(pk__in=groups_obj_perms)
+        queryset = queryset.filter(q)
+    return queryset
+
+def filter_objects_in_python(queryset, user, ctype, codenames,
+        use_groups=True):
+    """
+    Returns ``queryset`` filtered by list of primary keys of objects for which
+    ``user`` has all ``codenames``, computed in Python.
+    """
     # Now we should extract list of pk values for which we would filter queryset
     user_obj_perms = UserObjectPermission.objects\
         .filter(user=user)\
@@ -9,7 +9,7 @@ from django import template
 from django.contrib.auth.models import User, Group, AnonymousUser
 
 from guardian.exceptions import NotUserNorGroup
-from guardian.core import ObjectPermissionChecker
+from guardian.core import get_checker
 
 register = template.Library()
 
@@ -35,7 +35,7 @@ class ObjectPermissionsNode(template.Node):
                 % for_whom.__class__)
         obj = self.obj.resolve(context)
 
-        check = ObjectPermissionChecker(for_whom)
+        check = get_checker(for_whom)
         perms = check.get_perms(obj)
 
         context[self.context_var] = perms
@@ -4,6 +4,7 @@ from core_test import *
 from custompkmodel_test import *
 from decorators_test import *
 from forms_test import *
+from middleware_test import *
 from orphans_test import *
 from other_test import *
 from utils_test import *
@@ -1,16 +1,21 @@
 from itertools import chain
 
+import mock
 from django.conf import settings
 from django.contrib.auth import models as auth_app
 from django.contrib.auth.management import create_permissions
 from django.contrib.auth.models import User, Group, Permission, AnonymousUser
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.test import TestCase
 
 from guardian.core import ObjectPermissionChecker
 from guardian.exceptions import NotUserNorGroup
 from guardian.models import UserObjectPermission, GroupObjectPermission
 from guardian.shortcuts import assign
+from guardian.shortcuts import bulk_assign
+from guardian.shortcuts import bulk_remove_perm
+from guardian.cache import get_version
 
 class ObjectPermissionTestCase(TestCase):
 
@@ -153,3 +158,195 @@ class ObjectPermissionCheckerTest(ObjectPermissionTestCase):
                 GroupObjectPermission.objects.assign(perm, self.group, obj)
             self.assertEqual(sorted(perms), sorted(check.get_perms(obj)))
 
+
+    def test_prefetch_perms(self):
+        other_group = Group.objects.create(name='otherGroup')
+        objs = [ContentType.objects.create(name='ct%d' % i, model='foo%d' % i,
+            app_label='guardian-tests') for i in range(3)]
+        assign('change_contenttype', self.user, objs[0])
+        assign('delete_contenttype', self.group, objs[0])
+        assign('delete_contenttype', self.group, objs[1])
+        # permissions of groups the user does not belong to are ignored
+        assign('change_contenttype', other_group, objs[2])
+        expected = [
+            ['change_contenttype', 'delete_contenttype'],
+            ['delete_contenttype'],
+            [],
+        ]
+
+        settings.DEBUG = True
+        try:
+            from django.db import connection
+
+            ContentType.objects.get_for_model(self.ctype)
+            check = ObjectPermissionChecker(self.user)
+            query_count = len(connection.queries)
+            check.prefetch_perms(objs)
+            self.assertEqual(len(connection.queries), query_count + 1)
+
+            query_count = len(connection.queries)
+            for obj, perms in zip(objs, expected):
+                self.assertEqual(sorted(check.get_perms(obj)), perms)
+            self.assertEqual(len(connection.queries), query_count)
+
+            # already cached objects are not fetched again
+            query_count = len(connection.queries)
+            check.prefetch_perms(objs)
+            self.assertEqual(len(connection.queries), query_count)
+        finally:
+            settings.DEBUG = False
+
+        check = ObjectPermissionChecker(self.group)
+        check.prefetch_perms(objs)
+        self.assertEqual(check.get_perms(objs[0]), ['delete_contenttype'])
+        self.assertEqual(check.get_perms(objs[2]), [])
+
+    def test_prefetch_perms_superuser(self):
+        user = User.objects.create(username='superuser', is_superuser=True)
+        check = ObjectPermissionChecker(user)
+        check.prefetch_perms([self.ctype])
+        self.assertEqual(sorted(check.get_perms(self.ctype)),
+            sorted(ObjectPermissionChecker(user).get_perms(self.ctype)))
+
+
+class ObjectPermissionCacheTest(ObjectPermissionTestCase):
+
+    def setUp(self):
+        super(ObjectPermissionCacheTest, self).setUp()
+        self.patcher = mock.patch('guardian.conf.settings.CACHE_PERMISSIONS',
+            True)
+        self.patcher.start()
+        cache.clear()
+        ContentType.objects.get_for_model(self.group)
+
+    def tearDown(self):
+        self.patcher.stop()
+        cache.clear()
+
+    def count_queries(self, func, *args):
+        from django.db import connection
+        settings.DEBUG = True
+        try:
+            query_count = len(connection.queries)
+            result = func(*args)
+            return result, len(connection.queries) - query_count
+        finally:
+            settings.DEBUG = False
+
+    def test_shared_between_checkers(self):
+        assign('change_group', self.user, self.group)
+        ObjectPermissionChecker(self.user).get_perms(self.group)
+        perms, queries = self.count_queries(
+            ObjectPermissionChecker(self.user).get_perms, self.group)
+        self.assertEqual(perms, ['change_group'])
+        self.assertEqual(queries, 0)
+
+    def test_prefetch_perms(self):
+        groups = [Group.objects.create(name='group%d' % i) for i in range(3)]
+        assign('change_group', self.user, groups[1])
+        ObjectPermissionChecker(self.user).prefetch_perms(groups)
+        check = ObjectPermissionChecker(self.user)
+        result, queries = self.count_queries(check.prefetch_perms, groups)
+        self.assertEqual(queries, 0)
+        self.assertEqual(check.get_perms(groups[0]), [])
+        self.assertEqual(check.get_perms(groups[1]), ['change_group'])
+
+    def test_invalidated_by_assign_and_remove(self):
+        ObjectPermissionChecker(self.user).get_perms(self.group)
+        assign('change_group', self.user, self.group)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), ['change_group'])
+        UserObjectPermission.objects.remove_perm('change_group', self.user,
+            self.group)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), [])
+
+    def test_invalidated_by_bulk_assign_and_remove(self):
+        queryset = Group.objects.filter(pk=self.group.pk)
+        ObjectPermissionChecker(self.user).get_perms(self.group)
+        version = get_version()
+        bulk_assign('change_group', self.user, queryset)
+        self.assertNotEqual(get_version(), version)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), ['change_group'])
+        version = get_version()
+        bulk_remove_perm('change_group', self.user, queryset)
+        self.assertNotEqual(get_version(), version)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), [])
+
+    def test_invalidated_by_group_permissions(self):
+        ObjectPermissionChecker(self.user).get_perms(self.group)
+        GroupObjectPermission.objects.assign('delete_group', self.group,
+            self.group)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), ['delete_group'])
+
+    def test_invalidated_by_membership(self):
+        GroupObjectPermission.objects.assign('delete_group', self.group,
+            self.group)
+        ObjectPermissionChecker(self.user).get_perms(self.group)
+        self.user.groups.remove(self.group)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), [])
+        self.group.user_set.add(self.user)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), ['delete_group'])
+
+    def test_disabled(self):
+        self.patcher.stop()
+        try:
+            ObjectPermissionChecker(self.user).get_perms(self.group)
+            perms, queries = self.count_queries(
+                ObjectPermissionChecker(self.user).get_perms, self.group)
+            self.assertEqual(queries, 1)
+        finally:
+            self.patcher.start()
+
+
+class IntegerObjectPksTest(ObjectPermissionTestCase):
+
+    def setUp(self):
+        super(IntegerObjectPksTest, self).setUp()
+        self.patcher = mock.patch('guardian.conf.settings.INTEGER_OBJECT_PKS',
+            True)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_object_id_stored(self):
+        assign('change_group', self.user, self.group)
+        assign('delete_group', self.group, self.group)
+        self.assertEqual(UserObjectPermission.objects.get().object_id,
+            self.group.pk)
+        self.assertEqual(GroupObjectPermission.objects.get().object_id,
+            self.group.pk)
+
+    def test_get_perms(self):
+        assign('change_group', self.user, self.group)
+        assign('delete_group', self.group, self.group)
+        other_group = Group.objects.create(name='otherGroup')
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(sorted(check.get_perms(self.group)),
+            ['change_group', 'delete_group'])
+        self.assertEqual(check.get_perms(other_group), [])
+        check = ObjectPermissionChecker(self.group)
+        self.assertEqual(check.get_perms(self.group), ['delete_group'])
+
+    def test_prefetch_perms(self):
+        groups = [Group.objects.create(name='group%d' % i) for i in range(3)]
+        assign('change_group', self.user, groups[0])
+        assign('delete_group', self.group, groups[1])
+        check = ObjectPermissionChecker(self.user)
+        check.prefetch_perms(groups)
+        self.assertEqual(check.get_perms(groups[0]), ['change_group'])
+        self.assertEqual(check.get_perms(groups[1]), ['delete_group'])
+        self.assertEqual(check.get_perms(groups[2]), [])
+
+    def test_missing_object_id(self):
+        # rows stored before ``object_id`` got filled are not matched
+        assign('change_group', self.user, self.group)
+        UserObjectPermission.objects.update(object_id=None)
+        check = ObjectPermissionChecker(self.user)
+        self.assertEqual(check.get_perms(self.group), [])
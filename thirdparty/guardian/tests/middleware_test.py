@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.contrib.auth.models import User, Group, AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from guardian.backends import ObjectPermissionBackend
+from guardian.core import CHECKER_ATTR, get_checker, ObjectPermissionChecker
+from guardian.middleware import ObjectPermissionCheckerMiddleware
+from guardian.shortcuts import assign
+
+class ObjectPermissionCheckerMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='jack')
+        self.group = Group.objects.create(name='jackGroup')
+        self.anonymous_user, created = User.objects.get_or_create(
+            id=settings.ANONYMOUS_USER_ID,
+            username='AnonymousUser')
+        self.backend = ObjectPermissionBackend()
+        self.middleware = ObjectPermissionCheckerMiddleware()
+
+    def get_request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        self.middleware.process_request(request)
+        return request
+
+    def test_requires_user(self):
+        request = RequestFactory().get('/')
+        self.assertRaises(ImproperlyConfigured,
+            self.middleware.process_request, request)
+
+    def test_checker_is_shared(self):
+        request = self.get_request(self.user)
+        checker = get_checker(request.user)
+        self.assertTrue(checker is getattr(request.user, CHECKER_ATTR))
+        self.assertTrue(get_checker(request.user) is checker)
+        self.assertFalse(get_checker(User.objects.get(pk=self.user.pk))
+            is checker)
+
+    def test_backend_queries_once_per_object(self):
+        assign('change_group', self.user, self.group)
+        request = self.get_request(self.user)
+        ContentType.objects.get_for_model(self.group)
+        settings.DEBUG = True
+        try:
+            query_count = len(connection.queries)
+            self.assertTrue(self.backend.has_perm(request.user,
+                'change_group', self.group))
+            self.assertFalse(self.backend.has_perm(request.user,
+                'delete_group', self.group))
+            self.assertTrue(self.backend.has_perm(request.user,
+                'auth.change_group', self.group))
+            self.assertEqual(len(connection.queries), query_count + 1)
+        finally:
+            settings.DEBUG = False
+
+    def test_anonymous_user(self):
+        assign('change_group', self.anonymous_user, self.group)
+        request = self.get_request(AnonymousUser())
+        ContentType.objects.get_for_model(self.group)
+        settings.DEBUG = True
+        try:
+            query_count = len(connection.queries)
+            self.assertTrue(self.backend.has_perm(request.user,
+                'change_group', self.group))
+            self.assertTrue(self.backend.has_perm(request.user,
+                'change_group', self.group))
+            # anonymous user fetch and permissions fetch
+            self.assertEqual(len(connection.queries), query_count + 2)
+        finally:
+            settings.DEBUG = False
+
+    def test_inactive_user(self):
+        assign('change_group', self.user, self.group)
+        self.user.is_active = False
+        request = self.get_request(self.user)
+        self.assertFalse(self.backend.has_perm(request.user, 'change_group',
+            self.group))
+
+    def test_without_middleware(self):
+        checker = get_checker(self.user)
+        self.assertTrue(isinstance(checker, ObjectPermissionChecker))
+        self.assertFalse(hasattr(self.user, CHECKER_ATTR))
@@ -1,3 +1,4 @@
+import mock
 from django.contrib.auth import models as auth_app
 from django.contrib.auth.management import create_permissions
 from django.contrib.auth.models import User, Group
@@ -5,6 +6,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.management import call_command
 from django.test import TestCase
 
+from guardian.models import UserObjectPermission, GroupObjectPermission
 from guardian.utils import clean_orphan_obj_perms
 from guardian.shortcuts import assign
 
@@ -88,3 +90,32 @@ class OrphanedObjectPermissionsTest(TestCase):
             for perm in perms:
                 self.assertFalse(self.user.has_perm(perm, target))
 
+
+    def test_dry_run(self):
+        assign("change_user", self.user, self.target_user1)
+        assign("delete_group", self.group, self.target_group1)
+        self.target_user1.delete()
+        self.target_group1.delete()
+
+        call_command("clean_orphan_obj_perms", verbosity=0, dry_run=True)
+        self.assertEqual(UserObjectPermission.objects.count(), 1)
+        self.assertEqual(GroupObjectPermission.objects.count(), 1)
+        self.assertEqual(clean_orphan_obj_perms(dry_run=True), 2)
+
+        messages = []
+        self.assertEqual(clean_orphan_obj_perms(progress=messages.append), 2)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(UserObjectPermission.objects.count(), 0)
+        self.assertEqual(GroupObjectPermission.objects.count(), 0)
+
+    def test_batches(self):
+        targets = [Group.objects.create(name='target%d' % i)
+            for i in range(5)]
+        for target in targets:
+            assign("change_group", self.user, target)
+        for target in targets[1:4]:
+            target.delete()
+        with mock.patch('guardian.utils.ORPHANS_BATCH_SIZE', 2):
+            self.assertEqual(clean_orphan_obj_perms(), 3)
+        self.assertTrue(self.user.has_perm("change_group", targets[0]))
+        self.assertTrue(self.user.has_perm("change_group", targets[4]))
@@ -1,3 +1,5 @@
+import mock
+from django.conf import settings
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.db.models.query import QuerySet
@@ -7,12 +9,17 @@ from guardian.shortcuts import get_perms_for_model
 from guardian.core import ObjectPermissionChecker
 from guardian.shortcuts import assign
 from guardian.shortcuts import remove_perm
+from guardian.shortcuts import bulk_assign
+from guardian.shortcuts import bulk_remove_perm
 from guardian.shortcuts import get_perms
 from guardian.shortcuts import get_users_with_perms
 from guardian.shortcuts import get_groups_with_perms
 from guardian.shortcuts import get_objects_for_user
 from guardian.shortcuts import get_objects_for_group
+from guardian.shortcuts import filter_objects_in_sql
+from guardian.shortcuts import filter_objects_in_python
 from guardian.exceptions import MixedContentTypeError
+from guardian.models import UserObjectPermission, GroupObjectPermission
 from guardian.exceptions import NotUserNorGroup
 from guardian.exceptions import WrongAppError
 
@@ -521,6 +528,67 @@ class GetObjectsForUser(TestCase):
             set(objects.values_list('id', flat=True)),
             set([1, 2, 4, 5]))
 
+    def test_sql_and_python_filtering_match(self):
+        group = Group.objects.create(name='group1')
+        self.user.groups.add(group)
+        ctypes = dict(((ct.id, ct) for ct in ContentType.objects.all()))
+        assign('change_contenttype', self.user, ctypes[1])
+        assign('delete_contenttype', self.user, ctypes[1])
+        assign('change_contenttype', self.user, ctypes[2])
+        assign('delete_contenttype', group, ctypes[2])
+        assign('delete_contenttype', group, ctypes[3])
+        ctype = ContentType.objects.get_for_model(ContentType)
+        queryset = ContentType.objects.all()
+        for codenames in (set(['change_contenttype']),
+                set(['delete_contenttype']),
+                set(['change_contenttype', 'delete_contenttype'])):
+            for use_groups in (True, False):
+                self.assertEqual(
+                    set(filter_objects_in_sql(queryset, self.user, ctype,
+                        codenames, use_groups)),
+                    set(filter_objects_in_python(queryset, self.user, ctype,
+                        codenames, use_groups)))
+        objects = get_objects_for_user(self.user,
+            ['contenttypes.change_contenttype',
+            'contenttypes.delete_contenttype'])
+        self.assertEqual(set(objects.values_list('id', flat=True)),
+            set([1, 2]))
+
+    def test_single_query(self):
+        for ctype in ContentType.objects.all():
+            assign('change_contenttype', self.user, ctype)
+        count = ContentType.objects.count()
+        objects = get_objects_for_user(self.user,
+            'contenttypes.change_contenttype')
+        settings.DEBUG = True
+        try:
+            from django.db import connection
+            query_count = len(connection.queries)
+            self.assertEqual(len(list(objects)), count)
+            self.assertEqual(len(connection.queries), query_count + 1)
+        finally:
+            settings.DEBUG = False
+
+    def test_python_fallback(self):
+        assign('change_contenttype', self.user, self.ctype)
+        with mock.patch('guardian.shortcuts.can_filter_in_sql',
+                lambda queryset: False):
+            objects = get_objects_for_user(self.user,
+                'contenttypes.change_contenttype')
+        self.assertEqual(list(objects), [self.ctype])
+
+    def test_integer_object_pks(self):
+        group = Group.objects.create(name='group1')
+        self.user.groups.add(group)
+        assign('change_contenttype', self.user, self.ctype)
+        assign('change_contenttype', group, ContentType.objects.get(pk=1))
+        with mock.patch('guardian.conf.settings.INTEGER_OBJECT_PKS', True):
+            objects = get_objects_for_user(self.user,
+                'contenttypes.change_contenttype')
+            self.assertEqual(set(objects.values_list('id', flat=True)),
+                set([1, self.ctype.pk]))
+
+
 class GetObjectsForGroup(TestCase):
     """
     Tests get_objects_for_group function.
@@ -630,3 +698,59 @@ class GetObjectsForGroup(TestCase):
         self.assertEqual(set(get_objects_for_group(self.group2, 'contenttypes.delete_contenttype')),
             set([self.obj2]))
 
+
+
+class BulkAssignTest(ObjectPermissionTestCase):
+
+    def setUp(self):
+        super(BulkAssignTest, self).setUp()
+        self.groups = [Group.objects.create(name='group%d' % i)
+            for i in range(5)]
+        self.queryset = Group.objects.filter(name__startswith='group')
+
+    def test_user(self):
+        assign('change_group', self.user, self.groups[0])
+        self.assertEqual(bulk_assign('auth.change_group', self.user,
+            self.queryset), 4)
+        for group in self.groups:
+            self.assertTrue(self.user.has_perm('change_group', group))
+        self.assertFalse(self.user.has_perm('change_group', self.group))
+        self.assertEqual(UserObjectPermission.objects.filter(
+            permission__codename='change_group').count(), 5)
+
+        # already assigned objects are skipped
+        self.assertEqual(bulk_assign('change_group', self.user,
+            self.queryset), 0)
+
+        self.assertEqual(bulk_remove_perm('change_group', self.user,
+            self.queryset.exclude(pk=self.groups[0].pk)), 4)
+        self.assertTrue(self.user.has_perm('change_group', self.groups[0]))
+        self.assertFalse(self.user.has_perm('change_group', self.groups[1]))
+
+    def test_group(self):
+        self.assertEqual(bulk_assign('delete_group', self.group, Group), 6)
+        self.assertEqual(set(get_objects_for_group(self.group,
+            'auth.delete_group')), set(Group.objects.all()))
+        self.assertTrue(self.user.has_perm('delete_group', self.groups[3]))
+        self.assertEqual(bulk_remove_perm('delete_group', self.group,
+            Group.objects.all()), 6)
+        self.assertEqual(GroupObjectPermission.objects.count(), 0)
+
+    def test_batches(self):
+        with mock.patch('guardian.managers.BULK_BATCH_SIZE', 2):
+            self.assertEqual(bulk_assign('change_group', self.user,
+                self.queryset), 5)
+            self.assertEqual(bulk_remove_perm('change_group', self.user,
+                self.queryset), 5)
+        self.assertEqual(UserObjectPermission.objects.count(), 0)
+
+    def test_wrong_perm(self):
+        self.assertRaises(Permission.DoesNotExist, bulk_assign,
+            'change_user', self.user, self.queryset)
+
+    def test_object_id(self):
+        bulk_assign('change_group', self.user, self.queryset)
+        self.assertEqual(
+            set(UserObjectPermission.objects.values_list('object_id',
+                flat=True)),
+            set(group.pk for group in self.groups))
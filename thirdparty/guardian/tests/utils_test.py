@@ -1,8 +1,11 @@
+import mock
 from django.test import TestCase
 from django.contrib.auth.models import User, Group, AnonymousUser
+from django.contrib.sessions.models import Session
 
 from guardian.tests.core_test import ObjectPermissionTestCase
 from guardian.utils import get_anonymous_user, get_identity
+from guardian.utils import get_integer_pk, get_object_pk_field
 from guardian.exceptions import NotUserNorGroup
 
 class GetAnonymousUserTest(TestCase):
@@ -34,3 +37,18 @@ class GetIdentityTest(ObjectPermissionTestCase):
         self.assertRaises(NotUserNorGroup, get_identity, "User")
         self.assertRaises(NotUserNorGroup, get_identity, User)
 
+class IntegerPkTest(TestCase):
+
+    def test_get_integer_pk(self):
+        self.assertEqual(get_integer_pk(12), 12)
+        self.assertEqual(get_integer_pk(u'12'), 12)
+        self.assertEqual(get_integer_pk(u'-3'), -3)
+        self.assertEqual(get_integer_pk(u'foo'), None)
+        self.assertEqual(get_integer_pk(None), None)
+        self.assertEqual(get_integer_pk(str(2 ** 31)), None)
+
+    def test_get_object_pk_field(self):
+        self.assertEqual(get_object_pk_field(Group), 'object_pk')
+        with mock.patch('guardian.conf.settings.INTEGER_OBJECT_PKS', True):
+            self.assertEqual(get_object_pk_field(Group), 'object_id')
+            self.assertEqual(get_object_pk_field(Session), 'object_pk')
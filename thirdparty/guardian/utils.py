@@ -7,12 +7,22 @@ they actual input parameters/output type may change in future releases.
 """
 import logging
 from django.contrib.auth.models import User, AnonymousUser, Group
+from django.core.exceptions import ValidationError
 from guardian.exceptions import NotUserNorGroup
+from guardian.conf import settings as guardian_settings
 from guardian.conf.settings import ANONYMOUS_USER_ID
-from itertools import chain
 
 logger = logging.getLogger(__name__)
 
+# object pks checked (and orphan permissions deleted) per query
+ORPHANS_BATCH_SIZE = 500
+
+# primary key fields whose values are stored within ``object_id`` column
+INTEGER_PK_FIELDS = ('AutoField', 'IntegerField', 'PositiveIntegerField',
+    'SmallIntegerField', 'PositiveSmallIntegerField')
+INTEGER_PK_MIN = -2 ** 31
+INTEGER_PK_MAX = 2 ** 31 - 1
+
 
 def get_anonymous_user():
     """
@@ -21,6 +31,37 @@ def get_anonymous_user():
     """
     return User.objects.get(id=ANONYMOUS_USER_ID)
 
+def get_integer_pk(object_pk):
+    """
+    Returns ``object_pk`` as stored within integer ``object_id`` column of
+    object permissions, or ``None`` if it is not an integer.
+    """
+    try:
+        value = int(object_pk)
+    except (TypeError, ValueError):
+        return None
+    if not INTEGER_PK_MIN <= value <= INTEGER_PK_MAX:
+        return None
+    return value
+
+def uses_integer_pks(model):
+    """
+    Returns ``True`` if object permissions for instances of ``model`` are
+    looked up with integer ``object_id`` rather than ``object_pk`` column.
+    """
+    return guardian_settings.INTEGER_OBJECT_PKS and \
+        model._meta.pk.get_internal_type() in INTEGER_PK_FIELDS
+
+def get_object_pk_field(model):
+    """
+    Returns name of object permissions field to filter on for instances of
+    ``model``: ``object_id`` if integer keys are used, ``object_pk``
+    otherwise.
+    """
+    if uses_integer_pks(model):
+        return 'object_id'
+    return 'object_pk'
+
 def get_identity(identity):
     """
     Returns (user_obj, None) or (None, group_obj) tuple depending on what is
@@ -62,26 +103,82 @@ def get_identity(identity):
     raise NotUserNorGroup("User/AnonymousUser or Group instance is required "
         "(got %s)" % identity)
 
-def clean_orphan_obj_perms():
+def clean_orphan_obj_perms(dry_run=False, progress=None):
     """
     Seeks and removes all object permissions entries pointing at non-existing
     targets.
 
-    Returns number of removed objects.
+    Entries are processed per content type: existence of their targets is
+    checked with one query per ``ORPHANS_BATCH_SIZE`` object pks and orphans
+    are deleted in batches of the same size.
+
+    :param dry_run: if ``True``, orphans are only counted, not removed
+    :param progress: optional callable receiving a message after each
+      processed content type
+
+    Returns number of removed (or found, for dry run) objects.
     """
+    from django.contrib.contenttypes.models import ContentType
     from guardian.models import UserObjectPermission
     from guardian.models import GroupObjectPermission
 
-
     deleted = 0
-    # TODO: optimise
-    for perm in chain(UserObjectPermission.objects.all(),
-        GroupObjectPermission.objects.all()):
-        if perm.content_object is None:
-            logger.debug("Removing %s (pk=%d)" % (perm, perm.pk))
-            perm.delete()
-            deleted += 1
-    logger.info("Total removed orphan object permissions instances: %d" %
-        deleted)
+    for model in (UserObjectPermission, GroupObjectPermission):
+        ctype_ids = model.objects.values_list('content_type', flat=True)\
+            .distinct().order_by('content_type')
+        for ctype_id in ctype_ids:
+            ctype = ContentType.objects.get_for_id(ctype_id)
+            perms = model.objects.filter(content_type=ctype)
+            object_pks = set(perms.values_list('object_pk', flat=True)
+                .distinct().order_by())
+            orphans = sorted(get_orphan_pks(ctype, object_pks))
+            count = 0
+            for i in xrange(0, len(orphans), ORPHANS_BATCH_SIZE):
+                batch = perms.filter(
+                    object_pk__in=orphans[i:i + ORPHANS_BATCH_SIZE])
+                count += batch.count()
+                if not dry_run:
+                    batch.delete()
+            deleted += count
+            message = "%s.%s (%s): %d orphan object permissions for %d of "\
+                "%d objects" % (ctype.app_label, ctype.model,
+                model._meta.object_name, count, len(orphans), len(object_pks))
+            logger.debug(message)
+            if progress is not None:
+                progress(message)
+    if dry_run:
+        logger.info("Total found orphan object permissions instances: %d" %
+            deleted)
+    else:
+        logger.info("Total removed orphan object permissions instances: %d" %
+            deleted)
     return deleted
 
+def get_orphan_pks(ctype, object_pks):
+    """
+    Returns set of given ``object_pks`` (as stored in ``object_pk`` field) for
+    which there is no object of ``ctype`` content type.
+    """
+    model = ctype.model_class()
+    if model is None:
+        # model does not exist anymore
+        return set(object_pks)
+    pk_field = model._meta.pk
+    orphans = set()
+    candidates = {}
+    for object_pk in object_pks:
+        try:
+            candidates[object_pk] = pk_field.to_python(object_pk)
+        except ValidationError:
+            orphans.add(object_pk)
+    object_pks = list(candidates)
+    for i in xrange(0, len(object_pks), ORPHANS_BATCH_SIZE):
+        batch = object_pks[i:i + ORPHANS_BATCH_SIZE]
+        existing = set(model._default_manager
+            .filter(pk__in=[candidates[pk] for pk in batch])
+            .values_list('pk', flat=True))
+        for object_pk in batch:
+            if candidates[object_pk] not in existing:
+                orphans.add(object_pk)
+    return orphans
+